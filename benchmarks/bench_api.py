@@ -0,0 +1,68 @@
+import argparse
+import os
+import time
+
+os.environ.setdefault("TQDM_DISABLE", "1")  # progress bars would dominate the output
+
+from music import api
+from tests.fake_spotify import FakeSpotifyServer, make_id
+
+# Define defaults
+SIZES = [1_000, 10_000]  # a few minutes in all; pass e.g. `--sizes 100000 1000000` for a larger sweep
+FUNCS = [
+    "get_albums",
+    "get_artists",
+    "get_tracks",
+    "get_features",
+    "get_user_saved_tracks",
+    "get_playlist_tracks",
+    "get_user_playlists",
+]
+
+
+def bench(server: FakeSpotifyServer, func_name: str, size: int, max_workers: int | None) -> tuple[int, float]:
+    client = server.get_client()
+    func = getattr(api, func_name)
+    start = time.perf_counter()
+    if func_name == "get_user_saved_tracks":
+        server.num_saved_tracks = size
+        items = func(client, max_workers=max_workers)
+    elif func_name == "get_playlist_tracks":
+        server.num_playlist_tracks = size
+        items = func(client, make_id(0), max_workers=max_workers)
+    elif func_name == "get_user_playlists":
+        server.num_playlists = size
+        items = func(client, max_workers=max_workers)
+    else:
+        items = func(client, [make_id(i) for i in range(size)], max_workers=max_workers)
+    return len(items), time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark `music.api` against a local fake Spotify API.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--funcs", nargs="+", default=FUNCS, choices=FUNCS)
+    parser.add_argument("--max-workers", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds of latency per request")
+    parser.add_argument("--rate-limit-every", type=int, default=None, help="respond 429 to every Nth request")
+    parser.add_argument("--error-every", type=int, default=None, help="respond 500 to every Nth request")
+    args = parser.parse_args()
+
+    with FakeSpotifyServer(
+        latency=args.latency, rate_limit_every=args.rate_limit_every, error_every=args.error_every
+    ) as server:
+        print(f"{'function':<24}{'size':>10}{'workers':>9}{'requests':>10}{'wall (s)':>10}{'items/s':>12}")
+        for func_name in args.funcs:
+            for size in args.sizes:
+                for max_workers in args.max_workers:
+                    num_requests = server.num_requests
+                    num_items, elapsed = bench(server, func_name, size, max_workers)
+                    num_requests = server.num_requests - num_requests
+                    print(
+                        f"{func_name:<24}{size:>10}{max_workers:>9}{num_requests:>10}{elapsed:>10.2f}"
+                        f"{num_items / elapsed:>12.0f}"
+                    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import argparse
+import os
+import tempfile
+import time
+
+# Use a throwaway database, removed once the benchmark finishes
+db_dir = tempfile.TemporaryDirectory()
+os.environ["MUSIC_DB_URL"] = f"sqlite:///{os.path.join(db_dir.name, 'bench.db')}"
+
+from music import models
+from music.data import create_db
+from music.models import Artist
+
+# Define defaults
+SIZES = [1_000, 100_000, 1_000_000]
+
+
+def make_artists(start: int, stop: int) -> list[Artist]:
+    return [
+        Artist(id=f"{i:022d}", name=f"Artist {i}", uri=f"spotify:artist:{i}", genres=["genre"])
+        for i in range(start, stop)
+    ]
+
+
+def bench_read_many(size: int) -> float:
+    ids = [f"{i:022d}" for i in range(size)]
+    start = time.perf_counter()
+    artists = Artist.read_many(ids)
+    elapsed = time.perf_counter() - start
+    assert len(artists) == size
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark `BaseModel.read_many` on large ID sets.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    args = parser.parse_args()
+
+    with db_dir:
+        # Populate database
+        create_db()
+        num_rows = max(args.sizes)
+        for i in range(0, num_rows, 100_000):
+            Artist.create_many(make_artists(i, min(i + 100_000, num_rows)))
+
+        # Compare chunked `IN (...)` queries against a temporary table join
+        threshold = models.READ_TEMP_TABLE_THRESHOLD
+        print(f"{'size':>10}{'chunked (s)':>14}{'temp table (s)':>16}")
+        for size in args.sizes:
+            models.READ_TEMP_TABLE_THRESHOLD = size
+            chunked = bench_read_many(size)
+            models.READ_TEMP_TABLE_THRESHOLD = size - 1
+            temp_table = bench_read_many(size)
+            print(f"{size:>10}{chunked:>14.2f}{temp_table:>16.2f}")
+        models.READ_TEMP_TABLE_THRESHOLD = threshold
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import argparse
+import os
+import tempfile
+import time
+
+# Use a throwaway database and feature stores, removed once the benchmark finishes
+db_dir = tempfile.TemporaryDirectory()
+os.environ["MUSIC_DB_URL"] = f"sqlite:///{os.path.join(db_dir.name, 'bench.db')}"
+
+import numpy as np
+
+from music import similar
+from music.data import create_db
+from music.feature_store import FeatureStore
+from music.models import Features
+from music.similar import SimilarIndex
+
+# Define defaults
+SIZES = [10_000, 100_000, 300_000]
+NUM_QUERIES = 1_000
+K = 10
+
+
+def make_features(start: int, stop: int, rng: np.random.Generator) -> list[dict]:
+    return [
+        {
+            "id": f"{i:022d}",
+            "acousticness": rng.random(),
+            "danceability": rng.random(),
+            "energy": rng.random(),
+            "instrumentalness": rng.random() ** 4,
+            "key": int(rng.integers(-1, 12)),
+            "liveness": rng.random() ** 2,
+            "loudness": -60 * rng.random() ** 3,
+            "mode": int(rng.integers(0, 2)),
+            "speechiness": rng.random() ** 3,
+            "tempo": rng.normal(120, 30),
+            "time_signature": int(rng.integers(3, 8)),
+            "valence": rng.random(),
+        }
+        for i in range(start, stop)
+    ]
+
+
+def bench_brute_force(index: SimilarIndex, points: np.ndarray) -> float:
+    # One query at a time, over the whole standardized matrix
+    values = index._standardize(index.store.array)
+    start = time.perf_counter()
+    for point in points:
+        similar._nearest(point[None, :], values, K + 1)
+    return (time.perf_counter() - start) / len(points)
+
+
+def bench_index(index: SimilarIndex, ids: list[str], batched: bool) -> float:
+    start = time.perf_counter()
+    if batched:
+        index.similar_tracks(ids, k=K)
+    else:
+        for id in ids:
+            index.similar_tracks([id], k=K)
+    return (time.perf_counter() - start) / len(ids)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark `SimilarIndex` against brute force.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    args = parser.parse_args()
+
+    with db_dir:
+        # Populate database
+        create_db()
+        rng = np.random.default_rng(0)
+        num_rows = 0
+        print(f"{'size':>10}{'build (s)':>11}{'brute force (ms)':>18}{'index (ms)':>12}{'batched (ms)':>14}")
+        for size in sorted(args.sizes):
+            for i in range(num_rows, size, 100_000):
+                Features.create_rows(Features.rows_from_spotify(make_features(i, min(i + 100_000, size), rng)))
+            num_rows = size
+
+            # Build from scratch, then time per-query latency
+            store = FeatureStore(os.path.join(db_dir.name, f"feature_store_{size}"))
+            store.update()
+            start = time.perf_counter()
+            index = SimilarIndex(store)
+            build = time.perf_counter() - start
+            ids = [f"{i:022d}" for i in rng.choice(size, NUM_QUERIES, replace=False)]
+            points = index._standardize(store.array[store.get_rows(ids)])
+            brute_force = bench_brute_force(index, points[:100])  # slow enough that fewer queries suffice
+            single = bench_index(index, ids, batched=False)
+            batched = bench_index(index, ids, batched=True)
+            print(f"{size:>10}{build:>11.2f}{brute_force * 1e3:>18.3f}{single * 1e3:>12.3f}{batched * 1e3:>14.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,180 +1,661 @@
+import functools
+import itertools
 import os
-from datetime import datetime
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timezone
 from typing import TYPE_CHECKING, Any
 
-from spotipy.cache_handler import CacheFileHandler
+import requests
+from requests.adapters import HTTPAdapter
 from spotipy.client import Spotify
+from spotipy.exceptions import SpotifyException
 from spotipy.oauth2 import SpotifyClientCredentials, SpotifyOAuth
 from tqdm.auto import tqdm
+from urllib3.util.retry import Retry
+
+from music.archive import Archive
+from music.cache import CachedSession, ResponseCache, TokenCacheHandler
+from music.data import DATA_PATH
 
 if TYPE_CHECKING:
-    from collections.abc import Callable, Collection
+    from collections.abc import Callable, Collection, Iterable, Iterator
+
+    from typing_extensions import Self
 
 # Define cache location
 parent_dir = os.path.dirname(os.path.realpath(__file__))
 GENERAL_CACHE_PATH = os.path.join(parent_dir, "general.cache")
 USER_CACHE_PATH = os.path.join(parent_dir, "user.cache")
+RESPONSE_CACHE_PATH = os.path.join(DATA_PATH, "responses.cache")
 
 # Define scopes
 SCOPES = "playlist-read-private,user-library-read"
 
+# Define rate limit handling
+MAX_RETRIES = 5
+BACKOFF_MIN = 1.0  # seconds
+BACKOFF_MAX = 60.0  # seconds
+
+# Define connection pooling; enough kept-alive connections for the largest worker pools used when fetching
+POOL_SIZE = 32
+
+# Define batch loading
+MAX_MEMO_SIZE = 100_000  # fetched items kept per loader; the oldest are dropped first
+
 
 def _chunk_list(vals: "Collection[Any]", chunk_size: int) -> list[list[Any]]:
     list_vals = list(vals)
     return [list_vals[i : i + chunk_size] for i in range(0, len(list_vals), chunk_size)]
 
 
-def get_general_client() -> Spotify:
+class _RateLimiter:
+    # Shared between workers so that a single 429 pauses every request, not just the one that was rejected
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._resume_at = 0.0
+        self._backoff = 0.0
+
+    def wait(self):
+        with self._lock:
+            delay = self._resume_at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def penalize(self, retry_after: float | None = None):
+        with self._lock:
+            # Double the backoff on every consecutive 429, but always honor `Retry-After` when given
+            self._backoff = min(BACKOFF_MAX, max(BACKOFF_MIN, 2 * self._backoff))
+            delay = max(retry_after or 0.0, self._backoff)
+            self._resume_at = max(self._resume_at, time.monotonic() + delay)
+
+    def reward(self):
+        with self._lock:
+            self._backoff = self._backoff / 2 if self._backoff > BACKOFF_MIN else 0.0
+
+
+def _get_retry_after(e: SpotifyException) -> float | None:
+    retry_after = (e.headers or {}).get("Retry-After")
+    try:
+        return float(retry_after) if retry_after is not None else None
+    except ValueError:
+        return None
+
+
+def _call_with_retry(func: "Callable", limiter: _RateLimiter, *args, **kwargs) -> Any:
+    for attempt in range(MAX_RETRIES + 1):
+        limiter.wait()
+        try:
+            result = func(*args, **kwargs)
+        except SpotifyException as e:
+            if e.http_status != 429 or attempt == MAX_RETRIES:
+                raise
+            limiter.penalize(_get_retry_after(e))
+        else:
+            limiter.reward()
+            return result
+    raise AssertionError("unreachable")
+
+
+@functools.cache
+def get_response_cache() -> ResponseCache:
+    # Shared by every client in the process, so that hit and miss counts are global
+    os.makedirs(os.path.dirname(RESPONSE_CACHE_PATH), exist_ok=True)
+    return ResponseCache(RESPONSE_CACHE_PATH)
+
+
+@functools.cache
+def get_archive() -> Archive | None:
+    # Raw payloads of every fetch, so that models can be rebuilt offline; opt in by setting `MUSIC_ARCHIVE_PATH`, e.g.
+    # to `data/archive`
+    path = os.getenv("MUSIC_ARCHIVE_PATH", "")
+    return Archive(path) if path != "" else None
+
+
+def _archive(endpoint: str, items: "Iterable[dict[str, Any] | None]", get_id: "Callable", start: int = 0):
+    # Items without an ID, e.g. `None` for unknown IDs or local files in playlists, are not archived
+    archive = get_archive()
+    if archive is not None:
+        records = ((get_id(i, item), item) for i, item in enumerate(items, start=start) if item is not None)
+        archive.append(endpoint, ((id, item) for id, item in records if id is not None))
+
+
+def _iter_archived(
+    endpoint: str, pages: "Iterator[list[dict[str, Any]]]", get_id: "Callable"
+) -> "Iterator[list[dict[str, Any]]]":
+    position = 0
+    for items in pages:
+        _archive(endpoint, items, get_id, start=position)
+        position += len(items)
+        yield items
+
+
+def _get_id(position: int, item: dict[str, Any]) -> str | None:
+    return item["id"]
+
+
+def _get_track_id(position: int, item: dict[str, Any]) -> str | None:
+    return item["track"]["id"] if item["track"] is not None else None
+
+
+def _build_session(use_cache: bool) -> requests.Session:
+    session = CachedSession(get_response_cache()) if use_cache else requests.Session()
+
+    # Mirror the retry behavior of the session Spotipy would otherwise build, but keep more connections alive; 429s are
+    # left to `_call_with_retry`, so that one rate limiter owns backoff rather than each thread sleeping on its own
+    retry = Retry(
+        total=Spotify.max_retries,
+        connect=None,
+        read=False,
+        allowed_methods=frozenset(["GET", "POST", "PUT", "DELETE"]),
+        status=Spotify.max_retries,
+        backoff_factor=0.3,
+        status_forcelist=[code for code in Spotify.default_retry_codes if code != 429],
+        respect_retry_after_header=False,  # otherwise 429s with `Retry-After` are retried regardless
+    )
+    adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class _ClientCredentials(SpotifyClientCredentials):
+    # Serialize token lookups so that concurrent workers refresh an expiring token only once
+    _lock = threading.Lock()
+
+    def get_access_token(self, *args, **kwargs):
+        with self._lock:
+            return super().get_access_token(*args, **kwargs)
+
+
+class _OAuth(SpotifyOAuth):
+    # Serialize token lookups so that concurrent workers refresh an expiring token only once
+    _lock = threading.Lock()
+
+    def get_access_token(self, *args, **kwargs):
+        with self._lock:
+            return super().get_access_token(*args, **kwargs)
+
+
+@functools.cache
+def get_general_client(use_cache: bool = True) -> Spotify:
+    # Clients are shared process-wide, so connections and tokens are reused across calls and threads
     return Spotify(
-        client_credentials_manager=SpotifyClientCredentials(
-            cache_handler=CacheFileHandler(cache_path=GENERAL_CACHE_PATH)
-        )
+        client_credentials_manager=_ClientCredentials(cache_handler=TokenCacheHandler(cache_path=GENERAL_CACHE_PATH)),
+        requests_session=_build_session(use_cache),
     )
 
 
-def get_user_client(open_browser: bool = False) -> Spotify:
+@functools.cache
+def get_user_client(open_browser: bool = False, use_cache: bool = True) -> Spotify:
     # Assumes environment variables `SPOTIPY_CLIENT_ID`, `SPOTIPY_CLIENT_SECRET`, and `SPOTIPY_REDIRECT_URI` are set.
     return Spotify(
-        auth_manager=SpotifyOAuth(
+        auth_manager=_OAuth(
             scope=SCOPES,
-            cache_handler=CacheFileHandler(cache_path=USER_CACHE_PATH),
+            cache_handler=TokenCacheHandler(cache_path=USER_CACHE_PATH),
             redirect_uri="http://localhost:8501/callback",
             open_browser=open_browser,
-        )
+        ),
+        requests_session=_build_session(use_cache),
     )
 
 
-def _handle_chunked_ids(
+def _iter_ordered(calls: "Iterable[Callable[[], Any]]", max_workers: int) -> "Iterator[Any]":
+    # Keep at most `max_workers` calls in flight and yield results in order, so that consumers can stop early
+    in_flight: deque[Future] = deque()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        try:
+            for call in calls:
+                in_flight.append(executor.submit(call))
+                if len(in_flight) >= max_workers:
+                    yield in_flight.popleft().result()
+            while in_flight:
+                yield in_flight.popleft().result()
+        finally:
+            for future in in_flight:
+                future.cancel()
+
+
+def _iter_chunked_ids(
     func: "Callable",
     total: int,
     chunked_ids: list[list[str]],
     key: str | None = None,
     *args,
     bar_description: str | None = None,
+    max_workers: int | None = None,
     **kwargs,
-) -> list[dict[str, Any]]:
-    items = []
+) -> "Iterator[list[dict[str, Any]]]":
+    limiter = _RateLimiter()
+
+    def get_chunk(ids: list[str]) -> list[dict[str, Any]]:
+        new_items = _call_with_retry(func, limiter, ids, *args, **kwargs)
+        if key is not None:
+            new_items = new_items[key]
+        return new_items
+
+    # Fetch chunks one at a time, or concurrently while preserving input order
+    if max_workers is None or max_workers <= 1:
+        chunks = (get_chunk(ids) for ids in chunked_ids)
+    else:
+        chunks = _iter_ordered((functools.partial(get_chunk, ids) for ids in chunked_ids), max_workers=max_workers)
+
     with tqdm(total=total, desc=bar_description) as bar:
-        for ids in chunked_ids:
-            new_items = func(ids, *args, **kwargs)
-            if key is not None:
-                new_items = new_items[key]
-            items += new_items
+        for new_items in chunks:
             bar.update(len(new_items))
-    return items
+            yield new_items
+
+
+def _handle_chunked_ids(*args, **kwargs) -> list[dict[str, Any]]:
+    return [item for items in _iter_chunked_ids(*args, **kwargs) for item in items]
+
+
+def _iter_next_pages(
+    client: "Spotify", limiter: _RateLimiter, result: dict[str, Any]
+) -> "Iterator[list[dict[str, Any]]]":
+    while result:
+        yield result["items"]
+        result = _call_with_retry(client.next, limiter, result) if result["next"] else None
+
 
+def _iter_offset_pages(
+    func: "Callable",
+    limiter: _RateLimiter,
+    result: dict[str, Any],
+    *args,
+    max_workers: int,
+    limit: int | None = None,
+    **kwargs,
+) -> "Iterator[list[dict[str, Any]]]":
+    # The first page tells us everything needed to compute the remaining offsets
+    yield result["items"]
+    page_size = result["limit"]
+    end = min(limit, result["total"]) if limit else result["total"]
+    offsets = range(result["offset"] + page_size, end, page_size)
+
+    # Fetch the remaining pages concurrently
+    calls = (
+        functools.partial(_call_with_retry, func, limiter, *args, limit=page_size, offset=offset, **kwargs)
+        for offset in offsets
+    )
+    for page in _iter_ordered(calls, max_workers=max_workers):
+        yield page["items"]
 
-def _handle_next(
+
+def _iter_next(
     client: "Spotify",
     func: "Callable",
     *args,
     limit: int | None = None,
     bar_description: str | None = None,
     early_break: "Callable | None" = None,
+    max_workers: int | None = None,
+    page_size: int | None = None,
     **kwargs,
-) -> list[dict[str, Any]]:
-    # Get first result
-    items = []
-    result = func(*args, **kwargs)
+) -> "Iterator[list[dict[str, Any]]]":
+    # Get first result; later pages reuse its page size
+    num_items = 0
+    limiter = _RateLimiter()
+    first_kwargs = kwargs if page_size is None else {**kwargs, "limit": page_size}
+    result = _call_with_retry(func, limiter, *args, **first_kwargs)
     with tqdm(desc=bar_description, total=limit) as bar:
         # Update bar total
         bar.total = min(limit, result["total"]) if limit else result["total"]
 
-        # Handle result
-        while result:
-            # Get items and update bar progress
-            new_items = result["items"]
-            items += new_items
-            bar.update(len(new_items))
+        # Follow `next` links one at a time, or fetch the remaining offsets concurrently
+        if max_workers is None or max_workers <= 1:
+            pages = _iter_next_pages(client, limiter, result)
+        else:
+            pages = _iter_offset_pages(func, limiter, result, *args, max_workers=max_workers, limit=limit, **kwargs)
 
-            # Maybe break
-            num_items = len(items)
-            if limit is not None and num_items >= limit:
+        # Handle pages
+        for new_items in pages:
+            # Maybe truncate to limit
+            if limit is not None and num_items + len(new_items) >= limit:
                 bar.n = limit
-                items = items[:limit]
+                yield new_items[: limit - num_items]
                 break
-            if early_break is not None and early_break(items):
+
+            # Yield items and update bar progress
+            num_items += len(new_items)
+            bar.update(len(new_items))
+            yield new_items
+
+            # Maybe break
+            if early_break is not None and len(new_items) > 0 and early_break(new_items):
                 bar.total = num_items
                 bar.n = num_items
                 break
 
-            # Get next result
-            result = client.next(result) if result["next"] else None
-
-        return items
-
 
-def get_albums(client: Spotify, ids: "Collection[str]") -> list[dict[str, Any]]:
+def _handle_next(*args, **kwargs) -> list[dict[str, Any]]:
+    return [item for items in _iter_next(*args, **kwargs) for item in items]
+
+
+class BatchLoader:
+    # Coalesces individual ID lookups from any caller into full batch calls; every ID is fetched at most once
+    def __init__(
+        self,
+        func: "Callable",
+        batch_size: int,
+        key: str | None = None,
+        wait: float | None = 0.01,  # seconds; if `None`, partial batches are only sent by `flush`
+        max_workers: int = 1,
+        *,
+        endpoint: str | None = None,  # archive name, if any
+        max_memo_size: int = MAX_MEMO_SIZE,
+    ):
+        self.func = func
+        self.batch_size = batch_size
+        self.key = key
+        self.endpoint = endpoint
+        self.wait = wait
+        self.max_memo_size = max_memo_size
+        self.num_calls = 0
+        self._lock = threading.Lock()
+        self._memo: dict[str, Future] = {}
+        self._queue: list[tuple[str, Future]] = []
+        self._timer: threading.Timer | None = None
+        self._limiter = _RateLimiter()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def __enter__(self) -> "Self":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def load(self, id: str) -> Future:
+        return self.load_many([id])[0]
+
+    def load_many(self, ids: "Iterable[str]") -> list[Future]:
+        futures = []
+        with self._lock:
+            for id in ids:
+                future = self._memo.get(id)
+                if future is None:
+                    future = self._memo[id] = Future()
+                    self._queue.append((id, future))
+                    if len(self._queue) >= self.batch_size:
+                        self._dispatch()
+                futures.append(future)
+            if len(self._memo) > self.max_memo_size:
+                self._evict()
+
+            # Give other callers a short window to fill up the remaining batch
+            if len(self._queue) > 0 and self._timer is None and self.wait is not None:
+                self._timer = threading.Timer(self.wait, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        return futures
+
+    def get_many(self, ids: "Iterable[str]") -> list[dict[str, Any] | None]:
+        futures = self.load_many(ids)
+        if self.wait is None:
+            self.flush()
+        return [f.result() for f in futures]
+
+    def flush(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            while len(self._queue) > 0:
+                self._dispatch()
+
+    def clear(self):
+        with self._lock:
+            self._memo = {id: f for id, f in self._memo.items() if not f.done()}
+
+    def close(self):
+        # Send what is queued, wait for it, and free the workers and memo
+        self.flush()
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            self._memo = {}
+
+    def _evict(self):
+        # Must be called while holding the lock; pending futures are kept, since queued batches still resolve them
+        num_evict = len(self._memo) - self.max_memo_size
+        evicted = []
+        for id, future in self._memo.items():
+            if len(evicted) >= num_evict:
+                break
+            if future.done():
+                evicted.append(id)
+        for id in evicted:
+            del self._memo[id]
+
+    def _dispatch(self):
+        # Must be called while holding the lock
+        batch, self._queue = self._queue[: self.batch_size], self._queue[self.batch_size :]
+        self.num_calls += 1
+        self._executor.submit(self._fetch, batch)
+
+    def _fetch(self, batch: list[tuple[str, Future]]):
+        ids = [id for id, _ in batch]
+        try:
+            items = _call_with_retry(self.func, self._limiter, ids)
+            if self.key is not None:
+                items = items[self.key]
+            results = list(zip(batch, items, strict=True))
+        except Exception as e:
+            # Forget failed IDs so that they can be requested again
+            with self._lock:
+                for id in ids:
+                    self._memo.pop(id, None)
+            for _, future in batch:
+                future.set_exception(e)
+        else:
+            # Spotify returns items in request order, with `None` for unknown IDs
+            if self.endpoint is not None:
+                _archive(self.endpoint, [item for _, item in results], _get_id)
+            for (_, future), item in results:
+                future.set_result(item)
+
+
+def iter_albums(
+    client: Spotify, ids: "Collection[str]", max_workers: int | None = None
+) -> "Iterator[list[dict[str, Any]]]":
     chunked_ids = _chunk_list(ids, chunk_size=20)  # limit per call; from Spotify documentation
-    return _handle_chunked_ids(
-        client.albums, total=len(ids), chunked_ids=chunked_ids, key="albums", bar_description="Getting albums"
+    batches = _iter_chunked_ids(
+        client.albums,
+        total=len(ids),
+        chunked_ids=chunked_ids,
+        key="albums",
+        bar_description="Getting albums",
+        max_workers=max_workers,
     )
+    return _iter_archived("albums", batches, _get_id)
+
+
+def get_albums(client: Spotify, ids: "Collection[str]", max_workers: int | None = None) -> list[dict[str, Any]]:
+    return [a for albums in iter_albums(client, ids, max_workers=max_workers) for a in albums]
 
 
-def get_artists(client: Spotify, ids: "Collection[str]") -> list[dict[str, Any]]:
+def iter_artists(
+    client: Spotify, ids: "Collection[str]", max_workers: int | None = None
+) -> "Iterator[list[dict[str, Any]]]":
     chunked_ids = _chunk_list(ids, chunk_size=50)  # limit per call; from Spotify documentation
-    return _handle_chunked_ids(
-        client.artists, total=len(ids), chunked_ids=chunked_ids, key="artists", bar_description="Getting artists"
+    batches = _iter_chunked_ids(
+        client.artists,
+        total=len(ids),
+        chunked_ids=chunked_ids,
+        key="artists",
+        bar_description="Getting artists",
+        max_workers=max_workers,
     )
+    return _iter_archived("artists", batches, _get_id)
 
 
-def get_tracks(client: Spotify, ids: "Collection[str]") -> list[dict[str, Any]]:
+def get_artists(client: Spotify, ids: "Collection[str]", max_workers: int | None = None) -> list[dict[str, Any]]:
+    return [a for artists in iter_artists(client, ids, max_workers=max_workers) for a in artists]
+
+
+def iter_tracks(
+    client: Spotify, ids: "Collection[str]", max_workers: int | None = None
+) -> "Iterator[list[dict[str, Any]]]":
     chunked_ids = _chunk_list(ids, chunk_size=50)  # limit per call; from Spotify documentation
-    return _handle_chunked_ids(
-        client.tracks, total=len(ids), chunked_ids=chunked_ids, key="tracks", bar_description="Getting tracks"
+    batches = _iter_chunked_ids(
+        client.tracks,
+        total=len(ids),
+        chunked_ids=chunked_ids,
+        key="tracks",
+        bar_description="Getting tracks",
+        max_workers=max_workers,
     )
+    return _iter_archived("tracks", batches, _get_id)
 
 
-def get_playlist_tracks(client: Spotify, id: str, limit: int | None = None) -> list[dict[str, Any]]:
-    return _handle_next(client, client.playlist_items, id, limit=limit, bar_description="Getting playlist tracks")
+def get_tracks(client: Spotify, ids: "Collection[str]", max_workers: int | None = None) -> list[dict[str, Any]]:
+    return [t for tracks in iter_tracks(client, ids, max_workers=max_workers) for t in tracks]
 
 
-def get_user_playlists(client: Spotify, limit: int | None = None) -> list[dict[str, Any]]:
-    return _handle_next(client, client.current_user_playlists, limit=limit, bar_description="Getting user playlists")
+def iter_playlist_tracks(
+    client: Spotify, id: str, limit: int | None = None, max_workers: int | None = None
+) -> "Iterator[list[dict[str, Any]]]":
+    pages = _iter_next(
+        client,
+        client.playlist_items,
+        id,
+        limit=limit,
+        bar_description="Getting playlist tracks",
+        max_workers=max_workers,
+    )
+    return _iter_archived("playlist-tracks", pages, lambda position, _: f"{id}:{position}")  # as `PlaylistTrack.id`
 
 
-def get_user_saved_tracks(
-    client: Spotify, limit: int | None = None, since: "datetime | None" = None
+def get_playlist_tracks(
+    client: Spotify, id: str, limit: int | None = None, max_workers: int | None = None
 ) -> list[dict[str, Any]]:
-    # Break early when `since` is specified
+    return [t for tracks in iter_playlist_tracks(client, id, limit=limit, max_workers=max_workers) for t in tracks]
+
+
+def iter_user_playlists(
+    client: Spotify, limit: int | None = None, max_workers: int | None = None
+) -> "Iterator[list[dict[str, Any]]]":
+    pages = _iter_next(
+        client,
+        client.current_user_playlists,
+        limit=limit,
+        bar_description="Getting user playlists",
+        max_workers=max_workers,
+    )
+    return _iter_archived("playlists", pages, _get_id)
+
+
+def get_user_playlists(
+    client: Spotify, limit: int | None = None, max_workers: int | None = None
+) -> list[dict[str, Any]]:
+    return [p for playlists in iter_user_playlists(client, limit=limit, max_workers=max_workers) for p in playlists]
+
+
+def parse_added_at(item: dict[str, Any]) -> datetime:
+    return datetime.fromisoformat(item["added_at"].replace("Z", "+00:00"))
+
+
+def _format_added_at(dt: datetime) -> str:
+    # Spotify timestamps are fixed-width UTC strings, so they can be compared without parsing; naive means UTC
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc)
+    return dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def iter_user_saved_tracks(
+    client: Spotify,
+    limit: int | None = None,
+    since: "datetime | None" = None,
+    max_workers: int | None = None,
+    *,
+    until_id: str | None = None,
+    page_size: int | None = None,
+) -> "Iterator[list[dict[str, Any]]]":
+    # Tracks are ordered newest -> oldest, so everything from the first track older than `since` or with ID
+    # `until_id` onward is already known
+    since_added_at = _format_added_at(since) if since is not None else None
+
+    def is_known(track: dict[str, Any]) -> bool:
+        return (until_id is not None and track["track"]["id"] == until_id) or (
+            since_added_at is not None and track["added_at"] < since_added_at
+        )
+
     def early_break(tracks: list[dict[str, Any]]) -> bool:
-        oldest_track = tracks[-1]
-        oldest_dt = datetime.fromisoformat(oldest_track["added_at"].replace("Z", "+00:00"))
-        return oldest_dt < since  # type: ignore[reportOperatorIssue]  # function only called when `since` is not None
+        return any(is_known(t) for t in tracks)
 
     # Get tracks
-    tracks = _handle_next(
+    pages = _iter_next(
         client,
         client.current_user_saved_tracks,
         limit=limit,
-        early_break=early_break if since is not None else None,
+        early_break=early_break if since is not None or until_id is not None else None,
         bar_description="Getting user saved tracks",
+        max_workers=max_workers,
+        page_size=page_size,
     )
 
     # Maybe filter
-    if since is not None:
-        # Determine what to exclude; since things are ordered newest -> oldest, start from the end
-        keep_through = -1
-        for i in range(1, len(tracks) + 1):
-            track = tracks[-i]
-            track_dt = datetime.fromisoformat(track["added_at"].replace("Z", "+00:00"))
-            if track_dt < since:
-                keep_through -= 1
-            else:  # things are ordered so we can break early
-                break
+    filtered_pages = (list(itertools.takewhile(lambda t: not is_known(t), tracks)) for tracks in pages)
+    yield from _iter_archived("saved-tracks", filtered_pages, _get_track_id)
 
-        # Filter
-        if keep_through < -1:
-            tracks = tracks[0 : keep_through + 1]
 
-    return tracks
+def get_user_saved_tracks(
+    client: Spotify,
+    limit: int | None = None,
+    since: "datetime | None" = None,
+    max_workers: int | None = None,
+    *,
+    until_id: str | None = None,
+    page_size: int | None = None,
+) -> list[dict[str, Any]]:
+    pages = iter_user_saved_tracks(
+        client, limit=limit, since=since, max_workers=max_workers, until_id=until_id, page_size=page_size
+    )
+    return [t for tracks in pages for t in tracks]
 
 
-def get_features(client: Spotify, ids: "Collection[str]") -> list[dict[str, Any]]:
+def iter_features(
+    client: Spotify, ids: "Collection[str]", max_workers: int | None = None
+) -> "Iterator[list[dict[str, Any]]]":
     chunked_ids = _chunk_list(ids, chunk_size=100)  # limit per call; from Spotify documentation
-    return _handle_chunked_ids(
-        client.audio_features, total=len(ids), chunked_ids=chunked_ids, bar_description="Getting features"
+    batches = _iter_chunked_ids(
+        client.audio_features,
+        total=len(ids),
+        chunked_ids=chunked_ids,
+        bar_description="Getting features",
+        max_workers=max_workers,
     )
+    return _iter_archived("audio-features", batches, _get_id)
+
+
+def get_features(client: Spotify, ids: "Collection[str]", max_workers: int | None = None) -> list[dict[str, Any]]:
+    return [f for features in iter_features(client, ids, max_workers=max_workers) for f in features]
+
+
+# Loaders memoize every item they fetch, so use one per run, e.g. `with get_album_loader(client) as loader: ...`
+def get_album_loader(client: Spotify) -> BatchLoader:
+    return BatchLoader(
+        client.albums, batch_size=20, key="albums", endpoint="albums"
+    )  # limit per call; from Spotify documentation
+
+
+def get_artist_loader(client: Spotify) -> BatchLoader:
+    return BatchLoader(
+        client.artists, batch_size=50, key="artists", endpoint="artists"
+    )  # limit per call; from Spotify documentation
+
+
+def get_track_loader(client: Spotify) -> BatchLoader:
+    return BatchLoader(
+        client.tracks, batch_size=50, key="tracks", endpoint="tracks"
+    )  # limit per call; from Spotify documentation
+
+
+def get_features_loader(client: Spotify) -> BatchLoader:
+    return BatchLoader(
+        client.audio_features, batch_size=100, endpoint="audio-features"
+    )  # limit per call; from Spotify documentation
 
 
 if __name__ == "__main__":
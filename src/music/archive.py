@@ -0,0 +1,114 @@
+import gzip
+import json
+import os
+import sqlite3
+import threading
+import zlib
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+
+# Define archive layout
+INDEX_FILE = "index.db"
+SEGMENT_SUFFIX = ".ndjson.gz"
+LOOKUP_CHUNK_SIZE = 10_000  # IDs per `IN (...)`; well within SQLite's bound-parameter limit
+
+
+def _read_member(data: bytes, offset: int) -> list[bytes]:
+    # Each append is its own gzip member, so it can be decompressed without reading the rest of the segment
+    decompressor = zlib.decompressobj(wbits=zlib.MAX_WBITS | 16)
+    return decompressor.decompress(memoryview(data)[offset:]).splitlines()
+
+
+class Archive:
+    # Append-only store of raw API payloads, as gzipped NDJSON segments partitioned by endpoint and date; a SQLite
+    # index maps each (endpoint, ID) to its latest payload
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._segment_name = f"{datetime.now(tz=timezone.utc):%H%M%S}-{os.getpid()}{SEGMENT_SUFFIX}"
+
+        # Connection is shared between threads, so serialize access to it
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(path, INDEX_FILE), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS entries (
+                endpoint TEXT NOT NULL,
+                id TEXT NOT NULL,
+                segment TEXT NOT NULL,
+                offset INTEGER NOT NULL,
+                line INTEGER NOT NULL,
+                fetched_at TEXT NOT NULL,
+                PRIMARY KEY (endpoint, id)
+            )
+            """
+        )
+
+    def append(self, endpoint: str, records: "Iterable[tuple[str, dict[str, Any]]]"):
+        # Records are (ID, item) pairs
+        fetched_at = datetime.now(tz=timezone.utc).isoformat()
+        ids, lines = [], []
+        for id, item in records:
+            ids.append(id)
+            lines.append(json.dumps({"id": id, "fetched_at": fetched_at, "item": item}) + "\n")
+        if len(ids) == 0:
+            return
+        content = gzip.compress("".join(lines).encode())
+        segment = os.path.join(endpoint, fetched_at[:10], self._segment_name)  # partitioned by date
+        with self._lock:
+            segment_path = os.path.join(self.path, segment)
+            os.makedirs(os.path.dirname(segment_path), exist_ok=True)
+            with open(segment_path, "ab") as f:
+                offset = f.tell()
+                f.write(content)
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+                [(endpoint, id, segment, offset, i, fetched_at) for i, id in enumerate(ids)],
+            )
+            self._conn.execute("COMMIT")
+
+    def get_endpoints(self) -> list[str]:
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT DISTINCT endpoint FROM entries ORDER BY endpoint")]
+
+    def get_many(self, endpoint: str, ids: "Iterable[str]") -> dict[str, dict[str, Any]]:
+        unique_ids = list(dict.fromkeys(ids))
+        entries = []
+        with self._lock:
+            for i in range(0, len(unique_ids), LOOKUP_CHUNK_SIZE):
+                chunk = unique_ids[i : i + LOOKUP_CHUNK_SIZE]
+                placeholders = ", ".join("?" * len(chunk))
+                entries += self._conn.execute(
+                    f"SELECT segment, offset, line FROM entries WHERE endpoint = ? AND id IN ({placeholders})",
+                    (endpoint, *chunk),
+                ).fetchall()
+        return {r["id"]: r["item"] for r in self._read_entries(entries)}
+
+    def iter_latest(self, endpoint: str) -> "Iterator[dict[str, Any]]":
+        # Latest payload per ID; reads each segment once, in order, at disk speed
+        with self._lock:
+            entries = self._conn.execute(
+                "SELECT segment, offset, line FROM entries WHERE endpoint = ? ORDER BY segment, offset, line",
+                (endpoint,),
+            ).fetchall()
+        for record in self._read_entries(entries):
+            yield record["item"]
+
+    def _read_entries(self, entries: "Iterable[tuple[str, int, int]]") -> "Iterator[dict[str, Any]]":
+        # Group by segment and member, so that every member is decompressed only once
+        members: defaultdict[str, defaultdict[int, list[int]]] = defaultdict(lambda: defaultdict(list))
+        for segment, offset, line in entries:
+            members[segment][offset].append(line)
+        for segment, offsets in members.items():
+            with open(os.path.join(self.path, segment), "rb") as f:
+                data = f.read()
+            for offset, lines in offsets.items():
+                member = _read_member(data, offset)
+                for line in lines:
+                    yield json.loads(member[line])
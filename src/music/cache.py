@@ -0,0 +1,204 @@
+import json
+import sqlite3
+import threading
+import time
+from typing import TYPE_CHECKING
+from urllib.parse import urlsplit
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from spotipy.cache_handler import CacheFileHandler
+
+if TYPE_CHECKING:
+    from collections.abc import Mapping
+
+# Define time to live per endpoint; catalog payloads rarely change, user libraries are never cached
+DAY = 24 * 60 * 60  # seconds
+ENDPOINT_TTLS = {
+    "albums": 30 * DAY,
+    "artists": 7 * DAY,  # genres are refreshed more often than the rest of the catalog
+    "audio-features": 365 * DAY,
+    "tracks": 30 * DAY,
+}
+MAX_SIZE = 1024 * 1024 * 1024  # bytes
+
+# Define how long before expiry tokens are refreshed, so that in-flight requests never race an expiring token
+TOKEN_REFRESH_MARGIN = 5 * 60  # seconds
+
+
+def _get_endpoint(url: str) -> str:
+    # E.g. "https://api.spotify.com/v1/albums/?ids=..." -> "albums"
+    path = urlsplit(url).path.strip("/").split("/")
+    return path[1] if len(path) > 1 and path[0] == "v1" else path[0]
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        path: str,
+        ttls: "Mapping[str, float]" = ENDPOINT_TTLS,
+        max_size: int = MAX_SIZE,
+    ):
+        self.path = path
+        self.ttls = dict(ttls)
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+
+        # Connection is shared between threads, so serialize access to it
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                endpoint TEXT NOT NULL,
+                content BLOB NOT NULL,
+                headers TEXT NOT NULL,
+                etag TEXT,
+                expires_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                size INTEGER NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_responses_accessed_at ON responses (accessed_at)")
+        self._size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    @property
+    def stats(self) -> dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "revalidations": self.revalidations}
+
+    def record(self, stat: str):
+        with self._lock:
+            setattr(self, stat, getattr(self, stat) + 1)
+
+    def get_ttl(self, url: str) -> float | None:
+        return self.ttls.get(_get_endpoint(url))
+
+    def get(self, key: str) -> tuple[bytes, dict[str, str], str | None, bool] | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content, headers, etag, expires_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+        content, headers, etag, expires_at = row
+        return content, json.loads(headers), etag, expires_at < now
+
+    def put(self, key: str, content: bytes, headers: dict[str, str], ttl: float):
+        now = time.time()
+        size = len(content)
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, _get_endpoint(key), content, json.dumps(headers), headers.get("ETag"), now + ttl, now, size),
+            )
+            self._size += size - (old[0] if old is not None else 0)
+            if self._size > self.max_size:
+                self._evict()
+
+    def touch(self, key: str, ttl: float):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE responses SET expires_at = ?, accessed_at = ? WHERE key = ?", (now + ttl, now, key)
+            )
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._size = 0
+
+    def _evict(self):
+        # Drop least recently used responses until the cache fits within its size cap again
+        self._conn.execute(
+            """
+            DELETE FROM responses WHERE key IN (
+                SELECT key FROM (
+                    SELECT key, SUM(size) OVER (ORDER BY accessed_at DESC, key) AS running_size FROM responses
+                ) WHERE running_size > ?
+            )
+            """,
+            (self.max_size,),
+        )
+        self._size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+
+def _build_response(url: str, content: bytes, headers: dict[str, str]) -> requests.Response:
+    response = requests.Response()
+    response.status_code = 200
+    response._content = content
+    response.headers = CaseInsensitiveDict(headers)
+    response.url = url
+    response.encoding = "utf-8"
+    return response
+
+
+class CachedSession(requests.Session):
+    def __init__(self, cache: ResponseCache):
+        super().__init__()
+        self.cache = cache
+
+    def request(self, method: str | bytes, url: str | bytes, *args, **kwargs) -> requests.Response:  # type: ignore[override]
+        # Only catalog lookups are cached
+        ttl = self.cache.get_ttl(str(url))
+        if method != "GET" or ttl is None:
+            return super().request(method, url, *args, **kwargs)
+
+        # Maybe use cached response
+        key = requests.Request("GET", str(url), params=kwargs.get("params")).prepare().url
+        assert key is not None
+        cached = self.cache.get(key)
+        if cached is not None:
+            content, headers, etag, expired = cached
+            if not expired:
+                self.cache.record("hits")
+                return _build_response(key, content, headers)
+            if etag is not None:
+                kwargs["headers"] = {**(kwargs.get("headers") or {}), "If-None-Match": etag}
+
+        # Fetch and maybe revalidate
+        response = super().request(method, url, *args, **kwargs)
+        if response.status_code == 304 and cached is not None:
+            self.cache.record("revalidations")
+            self.cache.touch(key, ttl)
+            return _build_response(key, cached[0], cached[1])
+        self.cache.record("misses")
+        if response.status_code == 200:
+            headers = {k: response.headers[k] for k in ("Content-Type", "ETag") if k in response.headers}
+            self.cache.put(key, response.content, headers, ttl)
+        return response
+
+
+class TokenCacheHandler(CacheFileHandler):
+    # Keeps the token in memory; the cache file is only read once and only written when the token changes
+    def __init__(self, cache_path: str):
+        super().__init__(cache_path=cache_path)
+        self._lock = threading.Lock()
+        self._token_info: dict | None = None
+        self._loaded = False
+
+    def get_cached_token(self) -> dict | None:
+        with self._lock:
+            if not self._loaded:
+                self._token_info = super().get_cached_token()
+                self._loaded = True
+            if self._token_info is None or "expires_at" not in self._token_info:
+                return self._token_info
+
+            # Report the token as expiring early so that Spotipy refreshes it ahead of time
+            return {**self._token_info, "expires_at": self._token_info["expires_at"] - TOKEN_REFRESH_MARGIN}
+
+    def save_token_to_cache(self, token_info: dict):
+        with self._lock:
+            if self._loaded and token_info == self._token_info:
+                return
+            self._token_info = token_info
+            self._loaded = True
+            super().save_token_to_cache(token_info)
@@ -1,18 +1,60 @@
+import functools
 import os
-from typing import TYPE_CHECKING
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import TYPE_CHECKING, Any
 
+from sqlalchemy import event, inspect, text
 from sqlmodel import Session, SQLModel, create_engine
 
 if TYPE_CHECKING:
+    from collections.abc import Iterator
+
     from sqlalchemy.engine import Engine
 
+# Define SQLite pragmas applied to every new connection
+SQLITE_PRAGMAS: dict[str, Any] = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",  # safe with WAL; only the last transactions may be lost on power failure
+    "mmap_size": 256 * 1024 * 1024,  # bytes
+    "cache_size": -64 * 1024,  # negative means KiB rather than pages
+}
 
-def _get_engine() -> "Engine":
+# Define location of generated files, e.g. caches and exports; outside the package, so that they never end up in it
+DATA_PATH = os.path.abspath(os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "..", "data"))
+
+# Define session shared by model operations within `transaction`
+_session: ContextVar[Session | None] = ContextVar("session", default=None)
+
+
+def _get_db_url() -> str:
+    db_url = os.getenv("MUSIC_DB_URL", None)  # e.g. for benchmarks
+    if db_url is not None:
+        return db_url
     db_file = "test_data.db" if os.getenv("TEST", None) is not None else "data.db"
     parent_dir = os.path.dirname(os.path.realpath(__file__))
     db_path = os.path.abspath(os.path.join(parent_dir, "..", "..", db_file))
-    db_url = f"sqlite:///{db_path}"
-    return create_engine(db_url, echo=False)  # toggle to enable SQL statement logging
+    return f"sqlite:///{db_path}"
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for k, v in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {k}={v}")
+    cursor.close()
+
+
+@functools.cache
+def _create_engine(db_url: str) -> "Engine":
+    engine = create_engine(db_url, echo=False)  # toggle to enable SQL statement logging
+    if engine.dialect.name == "sqlite":
+        event.listen(engine, "connect", _set_sqlite_pragmas)
+    return engine
+
+
+def _get_engine() -> "Engine":
+    # Engines, and so their connection pools, are reused for the lifetime of the process
+    return _create_engine(_get_db_url())
 
 
 def get_session() -> Session:
@@ -20,9 +62,64 @@ def get_session() -> Session:
     return Session(engine, expire_on_commit=False)
 
 
+@contextmanager
+def transaction(session: Session | None = None) -> "Iterator[Session]":
+    # Model operations within the block share one connection and are committed once at the end; a supplied session
+    # is used as-is and committing it is left to the caller
+    current = _session.get()
+    if current is not None:  # nested transactions join the outer one
+        if session is not None and session is not current:
+            raise ValueError("A different session is already active; nested transactions must use the same one.")
+        yield current
+        return
+    owned = session is None
+    active = get_session() if session is None else session
+    token = _session.set(active)
+    try:
+        yield active
+        if owned:
+            active.commit()
+    finally:
+        _session.reset(token)
+        if owned:
+            active.close()
+
+
+@contextmanager
+def session_scope() -> "Iterator[Session]":
+    # Join the current transaction, or use a new session that is committed on exit
+    session = _session.get()
+    if session is not None:
+        yield session
+        return
+    with get_session() as session:
+        yield session
+        session.commit()
+
+
+def _add_missing_columns(engine: "Engine"):
+    # `create_all` only creates missing tables, so add columns introduced since, and their indexes; they must be
+    # nullable
+    inspector = inspect(engine)
+    with engine.begin() as connection:
+        for table in SQLModel.metadata.sorted_tables:
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    column_type = column.type.compile(engine.dialect)
+                    connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+                    for index in table.indexes:
+                        if column.name in index.columns:
+                            index.create(connection, checkfirst=True)
+
+
 def create_db():
+    from music.models import backfill_links  # deferred, since models import this module
+
     engine = _get_engine()
     SQLModel.metadata.create_all(engine)
+    _add_missing_columns(engine)
+    backfill_links()
 
 
 if __name__ == "__main__":
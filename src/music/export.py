@@ -0,0 +1,186 @@
+import functools
+import glob
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import TYPE_CHECKING
+
+import polars as pl
+
+from music.data import DATA_PATH
+from music.models import Album, Artist, Features, Playlist, PlaylistTrack, Track, TrackArtist, read_change_seq
+
+if TYPE_CHECKING:
+    from music.models import BaseModel
+
+# Define export location; each dataset is a directory of Parquet parts, bucketed by ID
+EXPORT_PATH = os.path.join(DATA_PATH, "exports")
+NUM_BUCKETS = 16
+MAX_PARTS = 8  # per bucket, before the bucket is compacted
+WATERMARK_FILE = "_watermark.json"  # the change sequence value exported up to; see `read_change_seq`
+
+# Define exported datasets
+MODELS: "list[type[BaseModel]]" = [Album, Artist, Features, Playlist, PlaylistTrack, Track]
+TRACK_FEATURES = "track_features"  # features joined with track metadata
+
+
+def get_export_path() -> str:
+    return os.getenv("MUSIC_EXPORT_PATH", EXPORT_PATH)
+
+
+@functools.cache
+def _get_lock(dataset_path: str) -> threading.Lock:
+    # Exports and compactions of a dataset must not interleave
+    return threading.Lock()
+
+
+@functools.cache
+def _get_executor() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=1)  # compactions run in the background, one at a time
+
+
+def _get_bucket(id: pl.Expr) -> pl.Expr:
+    # Stable across processes and library versions, unlike `Expr.hash`; Spotify IDs end in a random character
+    return id.str.tail(1).str.encode("hex").str.to_integer(base=16) % NUM_BUCKETS
+
+
+def _list_parts(bucket_path: str) -> list[str]:
+    return sorted(glob.glob(os.path.join(bucket_path, "*.parquet")))
+
+
+def _write_parquet(df: pl.DataFrame, path: str):
+    # Write atomically, so that scans never see a partial file
+    tmp_path = f"{path}.tmp"
+    df.write_parquet(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _get_part_path(bucket_path: str) -> str:
+    return os.path.join(bucket_path, f"part-{time.time_ns()}.parquet")
+
+
+def _read_watermark(dataset_path: str) -> int | None:
+    path = os.path.join(dataset_path, WATERMARK_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f).get("change_seq")  # `None` for watermarks of older exports, which re-export everything
+
+
+def _write_watermark(dataset_path: str, watermark: int):
+    os.makedirs(dataset_path, exist_ok=True)
+    with open(os.path.join(dataset_path, WATERMARK_FILE), "w") as f:
+        json.dump({"change_seq": watermark}, f)
+
+
+def _write_changes(dataset_path: str, df: pl.DataFrame):
+    # Replace rows by ID: drop their old versions from existing parts, then append the new versions as a new part
+    buckets = df.unique("id", keep="last").with_columns(_bucket=_get_bucket(pl.col("id")))
+    for (bucket,), changes in buckets.partition_by("_bucket", as_dict=True).items():
+        bucket_path = os.path.join(dataset_path, f"{bucket:02d}")
+        os.makedirs(bucket_path, exist_ok=True)
+        ids = changes["id"]
+        for part in _list_parts(bucket_path):
+            if not pl.read_parquet(part, columns=["id"])["id"].is_in(ids.implode()).any():
+                continue
+            kept = pl.read_parquet(part).filter(~pl.col("id").is_in(ids.implode()))
+            if kept.is_empty():
+                os.remove(part)
+            else:
+                _write_parquet(kept, part)
+        _write_parquet(changes.drop("_bucket"), _get_part_path(bucket_path))
+
+
+def _compact(dataset_path: str, model: "type[BaseModel]"):
+    # Merge each bucket's parts into one, dropping rows deleted from `model` since they were exported
+    with _get_lock(dataset_path):
+        live_ids = model.read_frame(columns=["id"])["id"]
+        for bucket_path in sorted(glob.glob(os.path.join(dataset_path, "[0-9][0-9]"))):
+            parts = _list_parts(bucket_path)
+            ids = pl.concat([pl.read_parquet(p, columns=["id"]) for p in parts])["id"] if len(parts) > 0 else None
+            if ids is None or (len(parts) <= MAX_PARTS and ids.is_in(live_ids.implode()).all()):
+                continue
+            df = pl.concat([pl.read_parquet(p) for p in parts]).filter(pl.col("id").is_in(live_ids.implode()))
+            if not df.is_empty():
+                _write_parquet(df, _get_part_path(bucket_path))
+            for part in parts:
+                os.remove(part)
+
+
+def export_model(model: "type[BaseModel]", path: str | None = None) -> int:
+    # Export rows changed since the last export, up to the latest committed change; those after are left for the next
+    dataset_path = os.path.join(path or get_export_path(), model.__tablename__)  # type: ignore[reportArgumentType]
+    with _get_lock(dataset_path):
+        watermark = _read_watermark(dataset_path)
+        latest = read_change_seq()
+        df = model.read_frame(changed_since=watermark, changed_until=latest)
+        if not df.is_empty():
+            _write_changes(dataset_path, df)
+            _write_watermark(dataset_path, latest)
+    return len(df)
+
+
+def read_track_features(ids: "pl.Series | None" = None) -> pl.DataFrame:
+    # Features, plus track name and artist names in credit order
+    features = Features.read_frame(ids).drop("pkey", "create_ts", "update_ts")
+    tracks = Track.read_frame(features["id"], columns=["id", "name"]).rename({"name": "track"})
+    track_artists = TrackArtist.read_frame(owner_ids=features["id"] if ids is not None else None)
+    artists = Artist.read_frame(track_artists["artist_id"].unique(), columns=["id", "name"])
+    meta = (
+        track_artists.sort("track_id", "position")
+        .join(artists, left_on="artist_id", right_on="id", how="left")
+        .group_by("track_id", maintain_order=True)
+        .agg(artists=pl.col("name").drop_nulls().unique(maintain_order=True))
+    )
+    return features.join(tracks, on="id", how="left").join(meta, left_on="id", right_on="track_id", how="left")
+
+
+def export_track_features(path: str | None = None) -> int:
+    dataset_path = os.path.join(path or get_export_path(), TRACK_FEATURES)
+    with _get_lock(dataset_path):
+        watermark = _read_watermark(dataset_path)
+        latest = read_change_seq()
+
+        # Rows change with their features, their track, or any of their artists
+        features, tracks, artists = [
+            model.read_frame(columns=["id"], changed_since=watermark, changed_until=latest)
+            for model in [Features, Track, Artist]
+        ]
+        artist_track_ids = TrackArtist.read_frame(values=artists["id"])["track_id"]
+        ids = pl.concat([features["id"], tracks["id"], artist_track_ids]).unique()
+
+        # Export changed rows
+        df = read_track_features(ids)
+        if not df.is_empty():
+            _write_changes(dataset_path, df)
+        if len(features) + len(tracks) + len(artists) > 0:
+            _write_watermark(dataset_path, latest)
+    return len(df)
+
+
+def compact_all(path: str | None = None):
+    path = path or get_export_path()
+    for model in MODELS:
+        _compact(os.path.join(path, model.__tablename__), model)  # type: ignore[reportArgumentType]
+    _compact(os.path.join(path, TRACK_FEATURES), Features)
+
+
+def export_all(path: str | None = None) -> tuple[dict[str, int], Future]:
+    # Export changed rows of every dataset, then compact in the background
+    path = path or get_export_path()
+    counts = {str(model.__tablename__): export_model(model, path) for model in MODELS}
+    counts[TRACK_FEATURES] = export_track_features(path)
+    return counts, _get_executor().submit(compact_all, path)
+
+
+def scan(dataset: str, path: str | None = None) -> pl.LazyFrame:
+    # Always-fresh view of a dataset, e.g. `scan("track_features")`
+    return pl.scan_parquet(os.path.join(path or get_export_path(), dataset, "*", "*.parquet"))
+
+
+if __name__ == "__main__":
+    counts, compaction = export_all()
+    print(", ".join(f"Exported {n} {dataset}" for dataset, n in counts.items()))
+    compaction.result()
@@ -0,0 +1,246 @@
+import json
+import os
+import threading
+from typing import TYPE_CHECKING
+
+import numpy as np
+import polars as pl
+import torch
+
+from music.data import DATA_PATH
+from music.models import Features, read_change_seq
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+# Define store location; a float32 matrix and its row IDs, as raw files that are memory-mapped rather than loaded
+FEATURE_STORE_PATH = os.path.join(DATA_PATH, "feature_store")
+MATRIX_FILE = "matrix.f32"
+IDS_FILE = "ids.bin"
+VERSIONS_FILE = "versions.u64"  # per row, the generation that last changed it
+META_FILE = "meta.json"
+ID_DTYPE = np.dtype("S32")  # Spotify IDs are 22 characters
+INITIAL_CAPACITY = 1024  # rows; doubled whenever it runs out
+
+# Define columns; one-hot values are from the Spotify documentation, and values outside them encode as all zeros
+NUMERIC_COLUMNS = [
+    "acousticness",
+    "danceability",
+    "energy",
+    "instrumentalness",
+    "key",
+    "liveness",
+    "loudness",
+    "mode",
+    "speechiness",
+    "tempo",
+    "time_signature",
+    "valence",
+]
+ONE_HOT_VALUES = {
+    "key": list(range(-1, 12)),  # -1 when no key was detected
+    "time_signature": list(range(3, 8)),
+}
+COLUMNS = [*NUMERIC_COLUMNS, *[f"{c}_{v}" for c, values in ONE_HOT_VALUES.items() for v in values]]
+
+
+def get_feature_store_path() -> str:
+    return os.getenv("MUSIC_FEATURE_STORE_PATH", FEATURE_STORE_PATH)
+
+
+def _encode(df: "pl.DataFrame") -> np.ndarray:
+    matrix = np.zeros((len(df), len(COLUMNS)), dtype=np.float32)
+    matrix[:, : len(NUMERIC_COLUMNS)] = df.select(NUMERIC_COLUMNS).to_numpy()
+    start = len(NUMERIC_COLUMNS)
+    for column, values in ONE_HOT_VALUES.items():
+        codes = df[column].to_numpy()
+        for i, value in enumerate(values):
+            matrix[:, start + i] = codes == value
+        start += len(values)
+    return matrix
+
+
+class FeatureStore:
+    # Features of every track as one contiguous float32 matrix, one row per track; rows are appended or overwritten
+    # in place as `Features` rows change, and the row count in the metadata is written last, so readers never see
+    # partially written rows
+    def __init__(self, path: str | None = None):
+        self.path = path or get_feature_store_path()
+        os.makedirs(self.path, exist_ok=True)
+        self._lock = threading.Lock()
+        self.refresh()
+
+    def refresh(self):
+        # Re-map the files, e.g. to see rows another process has added since
+        meta_path = os.path.join(self.path, META_FILE)
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            assert meta["columns"] == COLUMNS, "Columns changed; rebuild the store"
+        else:
+            meta = {"num_rows": 0, "capacity": 0, "generation": 0}
+        self._num_rows = meta["num_rows"]
+        self._capacity = meta["capacity"]
+        self._change_seq = meta.get("change_seq")  # written up to; `None` in older stores, which re-read every row
+        self._generation = meta["generation"]  # incremented by every update that writes rows
+        self._map()
+
+    def _map(self):
+        # Copy-on-write mappings are writable, as torch expects, without ever writing back to the files
+        if self._capacity == 0:
+            self._matrix = np.zeros((0, len(COLUMNS)), dtype=np.float32)
+            self._ids = np.zeros(0, dtype=ID_DTYPE)
+            self._versions = np.zeros(0, dtype=np.uint64)
+        else:
+            shape = (self._capacity, len(COLUMNS))
+            self._matrix = np.memmap(os.path.join(self.path, MATRIX_FILE), dtype=np.float32, mode="c", shape=shape)
+            self._ids = np.memmap(os.path.join(self.path, IDS_FILE), dtype=ID_DTYPE, mode="c", shape=self._capacity)
+            self._versions = np.memmap(
+                os.path.join(self.path, VERSIONS_FILE), dtype=np.uint64, mode="c", shape=self._capacity
+            )
+        self._index: dict[str, int] | None = None
+
+    def _get_index(self) -> dict[str, int]:
+        # Built on first use, so that opening the store costs no more than the mappings
+        if self._index is None:
+            self._index = {id.decode(): i for i, id in enumerate(self._ids[: self._num_rows])}
+        return self._index
+
+    def __len__(self) -> int:
+        return self._num_rows
+
+    def __contains__(self, id: str) -> bool:
+        return id in self._get_index()
+
+    @property
+    def array(self) -> np.ndarray:
+        # Zero-copy view of the matrix, shaped (tracks, `COLUMNS`)
+        return self._matrix[: self._num_rows]
+
+    @property
+    def id_array(self) -> np.ndarray:
+        # Zero-copy view of the IDs as fixed-width bytes, aligned with `array`
+        return self._ids[: self._num_rows]
+
+    @property
+    def ids(self) -> list[str]:
+        return list(self._get_index())
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def get_changed_rows(self, generation: int) -> np.ndarray:
+        # Row positions appended or overwritten with different values since `generation`
+        return np.flatnonzero(self._versions[: self._num_rows] > generation)
+
+    def tensor(self) -> torch.Tensor:
+        # Shares memory with `array`
+        return torch.from_numpy(self.array)
+
+    def get_rows(self, ids: "Iterable[str]") -> np.ndarray:
+        # Row positions of `ids`; raises `KeyError` for tracks without features
+        index = self._get_index()
+        return np.fromiter((index[id] for id in ids), dtype=np.int64)
+
+    def _write_meta(self):
+        # Written atomically, and last, so that it only ever describes fully written rows
+        meta = {
+            "columns": COLUMNS,
+            "num_rows": self._num_rows,
+            "capacity": self._capacity,
+            "change_seq": self._change_seq,
+            "generation": self._generation,
+        }
+        tmp_path = os.path.join(self.path, f"{META_FILE}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, os.path.join(self.path, META_FILE))
+
+    def _grow(self, num_rows: int):
+        # Extend the files rather than rewriting them; existing views keep mapping the rows they already had
+        capacity = max(self._capacity, INITIAL_CAPACITY)
+        while capacity < num_rows:
+            capacity *= 2
+        files = [(MATRIX_FILE, len(COLUMNS) * 4), (IDS_FILE, ID_DTYPE.itemsize), (VERSIONS_FILE, 8)]
+        for name, row_size in files:
+            with open(os.path.join(self.path, name), "ab") as f:
+                f.truncate(capacity * row_size)
+        self._capacity = capacity
+
+    def _write(self, df: "pl.DataFrame"):
+        # Overwrite rows of known tracks and append the rest
+        ids = df["id"].to_list()
+        if any(len(id) > ID_DTYPE.itemsize for id in ids):
+            raise ValueError(f"IDs must be at most {ID_DTYPE.itemsize} characters.")
+        index = self._get_index()
+        new_ids = [id for id in dict.fromkeys(ids) if id not in index]
+        num_rows = self._num_rows + len(new_ids)
+        if num_rows > self._capacity:
+            self._grow(num_rows)
+        index = {**index, **{id: self._num_rows + i for i, id in enumerate(new_ids)}}
+        rows = np.fromiter((index[id] for id in ids), dtype=np.int64, count=len(ids))
+
+        # Write through separate shared mappings, then publish the new rows
+        shape = (self._capacity, len(COLUMNS))
+        matrix = np.memmap(os.path.join(self.path, MATRIX_FILE), dtype=np.float32, mode="r+", shape=shape)
+        values = _encode(df)
+        is_changed = rows >= self._num_rows  # overlapping updates re-read unchanged rows, which keep their version
+        is_changed[~is_changed] = (matrix[rows[~is_changed]] != values[~is_changed]).any(axis=1)
+        matrix[rows] = values
+        matrix.flush()
+        ids_map = np.memmap(os.path.join(self.path, IDS_FILE), dtype=ID_DTYPE, mode="r+", shape=self._capacity)
+        ids_map[rows] = np.array(ids, dtype=ID_DTYPE)
+        ids_map.flush()
+        versions = np.memmap(os.path.join(self.path, VERSIONS_FILE), dtype=np.uint64, mode="r+", shape=self._capacity)
+        versions[rows[is_changed]] = self._generation
+        versions.flush()
+        del matrix, ids_map, versions
+        self._num_rows = num_rows
+
+    def _has_deleted_rows(self) -> bool:
+        # Compare IDs rather than counts, which miss deletes balanced out by inserts
+        if self._num_rows == 0:
+            return False
+        ids = Features.read_frame(columns=["id"])["id"]
+        return not pl.Series(self.ids).is_in(ids.implode()).all()
+
+    def _clear(self):
+        # Must be called while holding the lock
+        # Keep counting generations, so that rows written since are newer than any written before
+        generation = self._generation
+        for name in [MATRIX_FILE, IDS_FILE, VERSIONS_FILE, META_FILE]:
+            path = os.path.join(self.path, name)
+            if os.path.exists(path):
+                os.remove(path)  # readers keep their existing mappings
+        self.refresh()
+        self._generation = generation
+
+    def update(self) -> int:
+        # Write rows changed since the last update; if rows were deleted meanwhile, rebuild instead
+        with self._lock:
+            if self._has_deleted_rows():
+                self._clear()
+            latest = read_change_seq()
+            df = Features.read_frame(
+                columns=["id", *NUMERIC_COLUMNS], changed_since=self._change_seq, changed_until=latest
+            )
+            if not df.is_empty():
+                self._generation += 1
+                self._write(df)
+                self._change_seq = latest
+                self._write_meta()
+                self._map()
+        return len(df)
+
+    def rebuild(self) -> int:
+        # Rewrite from scratch, dropping rows of deleted features
+        with self._lock:
+            self._clear()
+        return self.update()
+
+
+if __name__ == "__main__":
+    store = FeatureStore()
+    num_rows = store.update()
+    print(f"Updated {num_rows} rows; {len(store)} tracks, {len(COLUMNS)} columns")
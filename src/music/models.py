@@ -1,26 +1,154 @@
+import functools
+import hashlib
+import itertools
+import json
 from datetime import datetime, timezone
-from typing import TYPE_CHECKING, Any
-
-from sqlalchemy import JSON, TIMESTAMP, insert, text, update
+from typing import TYPE_CHECKING, Any, ClassVar
+
+import polars as pl
+from pydantic import TypeAdapter
+from sqlalchemy import (
+    JSON,
+    TIMESTAMP,
+    Boolean,
+    Column,
+    DateTime,
+    Float,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    TypeDecorator,
+    delete,
+    func,
+    insert,
+    or_,
+    text,
+    type_coerce,
+    update,
+)
+from sqlalchemy import select as sa_select
 from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlmodel import Field, SQLModel, col, select
+from typing_extensions import NotRequired, TypedDict  # pydantic needs these on Python < 3.12
 
-from music.data import get_session
+from music.data import session_scope, transaction
 
 if TYPE_CHECKING:
-    from collections.abc import Iterable
+    from collections.abc import Callable, Iterable, Iterator
 
+    from sqlalchemy import Result, Row, Select
+    from sqlalchemy.orm import InstrumentedAttribute
+    from sqlmodel import Session
     from typing_extensions import Self
 
 # Define constants
-UPSERT_SKIP_COLS = {"id", "create_ts"}
+UPSERT_SKIP_COLS = {"pkey", "id", "create_ts"}
+ROW_SKIP_COLS = {"pkey", "create_ts", "update_ts", "content_hash", "change_seq"}  # not part of a row's content
+HIDDEN_COLS = {"content_hash", "change_seq"}  # bookkeeping, left out of model dumps and default reads
+READ_CHUNK_SIZE = 10_000  # IDs per `IN (...)`; well within SQLite's bound-parameter limit
+READ_TEMP_TABLE_THRESHOLD = 500_000  # IDs beyond which a temporary table join beats chunked `IN (...)` queries
 
 
 def _utc_now() -> datetime:
     return datetime.now(tz=timezone.utc)
 
 
+def _normalize_datetime(value: datetime) -> str:
+    # SQLite returns naive datetimes for values stored as UTC
+    value = value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+    return value.isoformat()
+
+
+def _get_normalizer(column: Column) -> "Callable[[Any], Any]":
+    # Hash content rather than Python types; e.g. table models don't validate, so floats may arrive as ints
+    sa_type = column.type.impl_instance if isinstance(column.type, TypeDecorator) else column.type
+    if isinstance(sa_type, Boolean):
+        return bool
+    if isinstance(sa_type, Integer):
+        return int
+    if isinstance(sa_type, Float):
+        return float
+    if isinstance(sa_type, DateTime):
+        return _normalize_datetime
+    return lambda value: value
+
+
+def _hash_row(row: dict[str, Any], normalizers: "dict[str, Callable[[Any], Any]]") -> str:
+    values = {c: None if (v := row.get(c)) is None else normalize(v) for c, normalize in normalizers.items()}
+    content = json.dumps(values, sort_keys=True, separators=(",", ":"))
+    return hashlib.blake2b(content.encode(), digest_size=16).hexdigest()
+
+
+def _get_polars_dtype(column: Column) -> "pl.DataType | type[pl.DataType]":
+    sa_type = column.type.impl_instance if isinstance(column.type, TypeDecorator) else column.type
+    if isinstance(sa_type, JSON):
+        return pl.String  # decoded after reading
+    if isinstance(sa_type, Boolean):
+        return pl.Boolean
+    if isinstance(sa_type, Integer):
+        return pl.Int64
+    if isinstance(sa_type, Float):
+        return pl.Float64
+    if isinstance(sa_type, DateTime):
+        return pl.Datetime
+    return pl.String
+
+
+@functools.cache
+def _get_row_adapter(model: type[SQLModel]) -> TypeAdapter:
+    # Validates a whole batch of rows in one call, without constructing model instances
+    fields = {
+        name: field.annotation if field.is_required() else NotRequired[field.annotation]  # type: ignore[reportInvalidTypeForm]
+        for name, field in model.model_fields.items()
+        if name not in ROW_SKIP_COLS
+    }
+    row_type = TypedDict(f"{model.__name__}Row", fields)  # type: ignore[reportArgumentType]
+    return TypeAdapter(list[row_type])
+
+
+# Define counter of writes, as a single row; each writing transaction takes the next value, see `_next_change_seq`
+CHANGE_SEQ_TABLE = Table(
+    "change_seq",
+    SQLModel.metadata,
+    Column("id", Integer, primary_key=True),
+    Column("value", Integer, nullable=False),
+)
+
+
+def _get_dialect_insert(session: "Session") -> "Callable":
+    dialect = session.bind.dialect.name  # type: ignore[reportOptionalMemberAccess]
+    if dialect == "sqlite":
+        return sqlite_insert
+    if dialect == "postgresql":  # pragma: no cover
+        return pg_insert
+    raise ValueError(f"Dialect {dialect} not understood.")  # pragma: no cover
+
+
+def _next_change_seq(session: "Session") -> int:
+    # The counter row stays locked until the transaction commits, so values are taken in commit order: once a reader
+    # sees a value, every write with a lower or equal one has committed
+    table = CHANGE_SEQ_TABLE
+    sql = _get_dialect_insert(session)(table).values(id=1, value=1)
+    sql = sql.on_conflict_do_update(index_elements=["id"], set_={"value": table.c.value + 1}).returning(table.c.value)
+    return session.execute(sql).scalar_one()
+
+
+def read_change_seq() -> int:
+    # Latest committed value; rows written since carry higher ones
+    with session_scope() as session:
+        return session.execute(sa_select(CHANGE_SEQ_TABLE.c.value)).scalar_one_or_none() or 0
+
+
+# Define temporary table for large ID sets; connection-local, so concurrent readers never see each other's IDs
+READ_IDS_TABLE = Table("read_ids", MetaData(), Column("id", String, primary_key=True), prefixes=["TEMPORARY"])
+
+
 class BaseModel(SQLModel):
+    # Map JSON list fields to the link tables that index their elements; kept in sync on every write
+    _links: ClassVar[dict[str, type["Link"]]] = {}
+
     pkey: int | None = Field(default=None, primary_key=True)
     id: str = Field(index=True, unique=True)
     create_ts: datetime = Field(
@@ -39,6 +167,8 @@ class BaseModel(SQLModel):
         },
         nullable=False,
     )
+    content_hash: str | None = Field(default=None, exclude=True)  # of all other non-timestamp columns; set on write
+    change_seq: int | None = Field(default=None, index=True, exclude=True)  # of the last write that changed the row
 
     def __hash__(self) -> int:
         return hash(f"{type(self)}(id={self.id})")
@@ -58,10 +188,31 @@ class BaseModel(SQLModel):
             obj.create_ts = now
             obj.update_ts = now
             to_create.append(obj.model_dump())
-        if len(to_create) > 0:
-            with get_session() as session:
-                session.execute(insert(cls), to_create)
-                session.commit()
+        cls.create_rows(to_create)
+
+    @classmethod
+    def create_rows(cls, rows: list[dict[str, Any]]):
+        if len(rows) > 0:
+            cls._hash_rows(rows)
+            with session_scope() as session:
+                cls._set_change_seq(session, rows)
+                session.execute(insert(cls), rows)
+                cls._replace_links(session, rows)
+
+    @classmethod
+    def _spotify_row(cls, item: dict[str, Any]) -> dict[str, Any]:
+        # Map a Spotify API item to model fields; must not mutate the item
+        return item
+
+    @classmethod
+    def rows_from_spotify(cls, items: "Iterable[dict[str, Any]]") -> list[dict[str, Any]]:
+        # Bulk ingestion path: validate API items in one pass straight into insert-ready rows
+        rows = _get_row_adapter(cls).validate_python([cls._spotify_row(item) for item in items])
+        now = _utc_now()
+        for row in rows:
+            row["create_ts"] = now
+            row["update_ts"] = now
+        return rows
 
     @classmethod
     def read_all(cls) -> list["Self"]:
@@ -71,90 +222,324 @@ class BaseModel(SQLModel):
     def read_id(cls, id: str) -> "Self":
         return cls.read_many([id])[0]
 
+    @classmethod
+    def _execute_many(
+        cls,
+        session: "Session",
+        statement: "Select",
+        ids: "Iterable[str] | None" = None,
+        *,
+        batch_size: int = READ_CHUNK_SIZE,
+    ) -> "Iterator[Result]":
+        # Results fetch `batch_size` rows at a time, through server-side cursors where the database has them
+        statement = statement.execution_options(yield_per=batch_size)
+
+        # Read everything
+        if ids is None:
+            yield session.execute(statement)
+            return
+
+        # Read IDs in chunks small enough to stay within bound-parameter limits
+        unique_ids = list(dict.fromkeys(ids))
+        if len(unique_ids) <= READ_TEMP_TABLE_THRESHOLD:
+            for i in range(0, len(unique_ids), READ_CHUNK_SIZE):
+                yield session.execute(statement.where(col(cls.id).in_(unique_ids[i : i + READ_CHUNK_SIZE])))
+            return
+
+        # Join against a temporary table of IDs for very large sets
+        read_ids = READ_IDS_TABLE
+        connection = session.connection()
+        read_ids.create(connection, checkfirst=True)
+        try:
+            connection.execute(insert(read_ids), [{"id": id} for id in unique_ids])
+            result = session.execute(statement.join(read_ids, read_ids.c.id == cls.id))
+            try:
+                yield result
+            finally:
+                result.close()  # SQLite can't drop a table that an open cursor still reads
+        finally:
+            read_ids.drop(connection)
+
     @classmethod
     def read_many(cls, ids: "Iterable[str] | None" = None) -> list["Self"]:
-        with get_session() as session:
-            statement = select(cls)
-            if ids is not None:
-                statement = statement.where(col(cls.id).in_(ids))
-            results = session.exec(statement)
-            return list(results)
+        with session_scope() as session:
+            return [obj for result in cls._execute_many(session, select(cls), ids) for obj in result.scalars()]
+
+    @classmethod
+    def iter_many(
+        cls,
+        ids: "Iterable[str] | None" = None,
+        columns: "Iterable[str] | None" = None,
+        *,
+        batch_size: int = READ_CHUNK_SIZE,
+    ) -> "Iterator[Row]":
+        # Stream rows as named tuples of just the requested columns, so that full-table scans run in bounded memory
+        table_columns = cls.__table__.columns  # type: ignore[reportAttributeAccessIssue]
+        names = list(columns) if columns is not None else [c.name for c in table_columns if c.name not in HIDDEN_COLS]
+        statement = sa_select(*[table_columns[n] for n in names])
+        with session_scope() as session:
+            for result in cls._execute_many(session, statement, ids, batch_size=batch_size):
+                yield from result
+
+    @classmethod
+    def read_frame(
+        cls,
+        ids: "Iterable[str] | None" = None,
+        columns: "Iterable[str] | None" = None,
+        *,
+        updated_since: datetime | None = None,
+        changed_since: int | None = None,  # exclusive; see `read_change_seq`
+        changed_until: int | None = None,  # inclusive
+    ) -> pl.DataFrame:
+        # Select raw JSON so that it can be decoded column-wise rather than per row
+        table_columns = cls.__table__.columns  # type: ignore[reportAttributeAccessIssue]
+        names = list(columns) if columns is not None else [c.name for c in table_columns if c.name not in HIDDEN_COLS]
+        json_names = [n for n in names if isinstance(table_columns[n].type, JSON)]
+        selected = [
+            type_coerce(table_columns[n], String).label(n) if n in json_names else table_columns[n] for n in names
+        ]
+        schema = {n: _get_polars_dtype(table_columns[n]) for n in names}
+        statement = sa_select(*selected)
+        if updated_since is not None:
+            statement = statement.where(table_columns["update_ts"] > updated_since)
+        if changed_since is not None:
+            statement = statement.where(table_columns["change_seq"] > changed_since)
+        if changed_until is not None:  # rows written before the sequence existed have none
+            change_seq = table_columns["change_seq"]
+            statement = statement.where(or_(change_seq <= changed_until, change_seq.is_(None)))
+
+        # Read rows straight into frames, without hydrating models
+        with session_scope() as session:
+            frames = [
+                pl.DataFrame(rows, schema=schema, orient="row")
+                for result in cls._execute_many(session, statement, ids)
+                for rows in result.partitions(READ_CHUNK_SIZE)
+            ]
+        df = pl.concat(frames) if len(frames) > 0 else pl.DataFrame(schema=schema)
+
+        # Decode JSON list columns and mark timestamps as UTC
+        return df.with_columns(
+            *[pl.col(n).str.json_decode(pl.List(pl.String)) for n in json_names],
+            *[pl.col(n).dt.replace_time_zone("UTC") for n, dtype in schema.items() if dtype == pl.Datetime],
+        )
+
+    @classmethod
+    def count(cls) -> int:
+        with session_scope() as session:
+            return session.execute(sa_select(func.count()).select_from(cls)).scalar_one()
+
+    @classmethod
+    def select_ids(cls) -> "Select":
+        return sa_select(col(cls.id))
+
+    @classmethod
+    def read_missing_ids(cls, ids: "Select") -> list[str]:
+        # Anti-join in SQL, so that neither side has to be loaded into Python
+        referenced = ids.subquery()
+        referenced_id = referenced.c[0]
+        statement = (
+            sa_select(referenced_id)
+            .distinct()
+            .outerjoin(cls, col(cls.id) == referenced_id)
+            .where(col(cls.id).is_(None), referenced_id.is_not(None))
+        )
+        with session_scope() as session:
+            return list(session.execute(statement).scalars())
 
     def update(self):
         return self.update_many([self])
 
     @classmethod
     def update_many(cls, objs: "Iterable[Self]"):
-        now = _utc_now()
-        to_update = []
+        # Plain `UPDATE` by primary key, so rows deleted meanwhile stay deleted; SQLAlchemy raises `StaleDataError`.
+        # Rows whose content is unchanged are skipped, so that they keep their timestamps and aren't re-exported
+        objs = list(objs)
+        rows = []
         for obj in objs:
             assert obj.pkey is not None
-            obj.update_ts = now
-            to_update.append(obj.model_dump())
-        if len(to_update) > 0:
-            with get_session() as session:
+            rows.append(obj.model_dump())
+        if len(rows) == 0:
+            return
+        cls._hash_rows(rows)
+        with session_scope() as session:
+            stored_hashes: dict[int, str | None] = {}
+            for i in range(0, len(rows), READ_CHUNK_SIZE):
+                pkeys = [row["pkey"] for row in rows[i : i + READ_CHUNK_SIZE]]
+                statement = sa_select(col(cls.pkey), col(cls.content_hash)).where(col(cls.pkey).in_(pkeys))
+                stored_hashes.update(session.execute(statement).tuples().all())
+            now = _utc_now()
+            to_update = []
+            for obj, row in zip(objs, rows, strict=True):
+                if row["pkey"] not in stored_hashes or stored_hashes[row["pkey"]] != row["content_hash"]:
+                    obj.update_ts = now
+                    to_update.append({**row, "update_ts": now})
+            if len(to_update) > 0:
+                cls._set_change_seq(session, to_update)
                 session.execute(update(cls), to_update)
-                session.commit()
+                cls._replace_links(session, to_update)
 
     def delete(self):
-        cls = self.__class__
         assert self.pkey is not None
-        with get_session() as session:
-            statement = select(cls).where(cls.id == self.id)
-            results = session.exec(statement)
-            obj = results.one()
-            session.delete(obj)
-            session.commit()
+        self.delete_many([self.id])
+
+    @classmethod
+    def delete_many(cls, ids: "Iterable[str]") -> int:
+        # Set-based deletes in chunks small enough to stay within bound-parameter limits; returns rows deleted
+        unique_ids = list(dict.fromkeys(ids))
+        num_deleted = 0
+        with session_scope() as session:
+            for i in range(0, len(unique_ids), READ_CHUNK_SIZE):
+                chunk = unique_ids[i : i + READ_CHUNK_SIZE]
+                result = session.execute(delete(cls.__table__).where(cls.__table__.c.id.in_(chunk)))  # type: ignore[reportAttributeAccessIssue]
+                num_deleted += result.rowcount  # type: ignore[reportAttributeAccessIssue]
+            cls._delete_links(session, unique_ids)
+        return num_deleted
+
+    @classmethod
+    def delete_orphans(cls, ids: "Select") -> int:
+        # Delete rows whose ID isn't among `ids`, then link rows whose owner is gone, each as a single statement;
+        # `NOT IN` lets SQLite build the referenced set once, rather than probing it per row
+        referenced = ids.subquery()
+        referenced_id = referenced.c[0]
+        table_id = cls.__table__.c.id  # type: ignore[reportAttributeAccessIssue]
+        statement = delete(cls.__table__).where(  # type: ignore[reportArgumentType]
+            table_id.not_in(sa_select(referenced_id).where(referenced_id.is_not(None)))
+        )
+        with session_scope() as session:
+            num_deleted = session.execute(statement).rowcount  # type: ignore[reportAttributeAccessIssue]
+            for link in cls._links.values():
+                owner_column = link.__table__.c[link.owner_column]  # type: ignore[reportAttributeAccessIssue]
+                session.execute(delete(link.__table__).where(owner_column.not_in(sa_select(table_id))))  # type: ignore[reportArgumentType]
+        return num_deleted
 
     def upsert(self):
         return self.upsert_many([self])
 
     @classmethod
-    def upsert_many(cls, objs: "Iterable[Self]"):
-        # Get dialect
-        with get_session() as session:
-            dialect = session.bind.dialect.name  # type: ignore[reportOptionalMemberAccess]
+    def upsert_many(cls, objs: "Iterable[Self]") -> dict[str, int]:
+        now = _utc_now()
+        to_upsert = []
+        for obj in objs:
+            obj.create_ts = now  # will be ignored by `ON CONFLICT DO` because of `UPSERT_SKIP_COLS`
+            obj.update_ts = now
+            to_upsert.append(obj.model_dump(exclude={"pkey"}))
+        return cls.upsert_rows(to_upsert)
 
-        # Handle different dialects
-        if dialect == "sqlite":
-            # SQLite doesn't support `ON CONFLICT DO`, so we have to work around those limitations
+    @classmethod
+    def upsert_rows(cls, rows: list[dict[str, Any]]) -> dict[str, int]:
+        if len(rows) == 0:
+            return {"inserted": 0, "updated": 0, "unchanged": 0}
+        cls._hash_rows(rows)
+        with session_scope() as session:
+            dialect_insert = _get_dialect_insert(session)
+            cls._set_change_seq(session, rows)  # kept by rows whose content is unchanged, since they aren't updated
+
+            # Insert new rows first, so that inserts are known from `RETURNING` rather than inferred; the last row of
+            # an ID wins
+            table = cls.__table__  # type: ignore[reportAttributeAccessIssue]
+            unique_rows = list({row["id"]: row for row in rows}.values())
+            sql = dialect_insert(table).on_conflict_do_nothing(index_elements=["id"]).returning(table.c.id)
+            inserted_ids = set(session.execute(sql, unique_rows).scalars())
+
+            # Then update the rest, skipping rows whose content is unchanged; rows are only returned when written
+            to_update = [row for row in unique_rows if row["id"] not in inserted_ids]
+            updated_ids = set()
+            if len(to_update) > 0:
+                sql = dialect_insert(table)
+                sql = sql.on_conflict_do_update(
+                    index_elements=["id"],
+                    set_={k: v for k, v in sql.excluded.items() if k not in UPSERT_SKIP_COLS},
+                    where=table.c.content_hash.is_distinct_from(sql.excluded.content_hash),
+                ).returning(table.c.id)
+                updated_ids = set(session.execute(sql, to_update).scalars())
+
+            # Only rewrite links of rows that changed
+            written_ids = inserted_ids | updated_ids
+            cls._replace_links(session, [row for row in unique_rows if row["id"] in written_ids])
+        return {
+            "inserted": len(inserted_ids),
+            "updated": len(updated_ids),
+            "unchanged": len(unique_rows) - len(written_ids),
+        }
 
-            # Check for what already exists
-            upsert_ids = {o.id for o in objs}
-            existing_objs = {o.id: o for o in cls.read_many(upsert_ids)}
-            existing_ids = set(existing_objs.keys())
+    @classmethod
+    def _set_change_seq(cls, session: "Session", rows: list[dict[str, Any]]):
+        change_seq = _next_change_seq(session)
+        for row in rows:
+            row["change_seq"] = change_seq
 
-            # Insert and update
-            to_create = []
-            to_update = []
-            for o in objs:
-                if o.id not in existing_ids:
-                    to_create.append(o)
-                else:
-                    existing_obj = existing_objs[o.id]
-                    for c in UPSERT_SKIP_COLS:
-                        setattr(o, c, getattr(existing_obj, c))
-                    to_update.append(o)
-            cls.create_many(to_create)
-            cls.update_many(to_update)
-        elif dialect == "postgresql":  # pragma: no cover
-            now = _utc_now()
-            to_upsert = []
-            for obj in objs:
-                obj.create_ts = now  # will be ignored by `ON CONFLICT DO` because of `UPSERT_SKIP_COLS`
-                obj.update_ts = now
-                to_upsert.append(obj.model_dump())
-            if len(to_upsert) > 0:
-                with get_session() as session:
-                    sql = pg_insert(cls)
-                    sql = sql.on_conflict_do_update(
-                        index_elements=["id"],
-                        set_={k: v for k, v in sql.excluded.items() if k not in UPSERT_SKIP_COLS},
-                    )
-                    session.exec(sql, params=to_upsert)  # type: ignore[reportCallIssue,reportArgumentType]
-                    session.commit()
-        else:  # pragma: no cover
-            raise ValueError(f"Dialect {dialect} not understood.")
+    @classmethod
+    def _hash_rows(cls, rows: list[dict[str, Any]]):
+        normalizers = {
+            c.name: _get_normalizer(c)
+            for c in cls.__table__.columns  # type: ignore[reportAttributeAccessIssue]
+            if c.name not in ROW_SKIP_COLS
+        }
+        for row in rows:
+            row["content_hash"] = _hash_row(row, normalizers)
+
+    @classmethod
+    def _delete_links(cls, session: "Session", ids: list[str]):
+        for link in cls._links.values():
+            owner_column = link.__table__.c[link.owner_column]  # type: ignore[reportAttributeAccessIssue]
+            for i in range(0, len(ids), READ_CHUNK_SIZE):
+                session.execute(delete(link.__table__).where(owner_column.in_(ids[i : i + READ_CHUNK_SIZE])))  # type: ignore[reportAttributeAccessIssue]
+
+    @classmethod
+    def _replace_links(cls, session: "Session", rows: list[dict[str, Any]]):
+        if len(cls._links) == 0:
+            return
+
+        # Replace the link rows of every written row; the last write of an ID wins
+        rows_by_id = {row["id"]: row for row in rows}
+        cls._delete_links(session, list(rows_by_id))
+        for field, link in cls._links.items():
+            to_create = [
+                {link.owner_column: id, "position": position, link.value_column: value}
+                for id, row in rows_by_id.items()
+                for position, value in enumerate(row[field])
+            ]
+            if len(to_create) > 0:
+                session.execute(insert(link.__table__), to_create)  # type: ignore[reportAttributeAccessIssue]
+
+    @classmethod
+    def rebuild_links(cls):
+        # Backfill link tables from the JSON columns, e.g. for databases created before the link tables existed
+        if len(cls._links) == 0:
+            return
+        rows = cls.iter_many(columns=["id", *cls._links])
+        with transaction() as session:  # reads and writes share one connection
+            while len(batch := list(itertools.islice(rows, READ_CHUNK_SIZE))) > 0:
+                cls._replace_links(session, [row._asdict() for row in batch])
+
+    @classmethod
+    def backfill_links(cls) -> bool:
+        # Rebuild links only if there are rows but no links at all, so that it is cheap to call on every startup
+        if len(cls._links) == 0:
+            return False
+        with session_scope() as session:
+            tables = [cls.__table__, *[link.__table__ for link in cls._links.values()]]  # type: ignore[reportAttributeAccessIssue]
+            has_rows, *has_links = [
+                session.execute(sa_select(1).select_from(t).limit(1)).first() is not None for t in tables
+            ]
+        if not has_rows or any(has_links):
+            return False
+        cls.rebuild_links()
+        return True
+
+    @classmethod
+    def _read_linked(
+        cls, id_column: "InstrumentedAttribute", filter_column: "InstrumentedAttribute", values: "Iterable[str]"
+    ) -> list["Self"]:
+        # Read rows linked to any of `values` through the indexed columns of a link table
+        statement = select(cls).where(col(cls.id) == id_column)
+        unique_values = list(dict.fromkeys(values))
+        objs = {}
+        with session_scope() as session:
+            for i in range(0, len(unique_values), READ_CHUNK_SIZE):
+                for obj in session.exec(statement.where(filter_column.in_(unique_values[i : i + READ_CHUNK_SIZE]))):
+                    objs.setdefault(obj.id, obj)
+        return list(objs.values())
 
 
 class Named(BaseModel):
@@ -162,6 +547,75 @@ class Named(BaseModel):
     uri: str
 
 
+class Link(SQLModel):
+    # One element of a JSON list column, keyed by owner and position and indexed by value
+    owner_column: ClassVar[str]
+    value_column: ClassVar[str]
+
+    @classmethod
+    def read_frame(
+        cls, owner_ids: "Iterable[str] | None" = None, values: "Iterable[str] | None" = None
+    ) -> pl.DataFrame:
+        # Optionally filter by owners or by values, each through their own index
+        assert owner_ids is None or values is None
+        table = cls.__table__  # type: ignore[reportAttributeAccessIssue]
+        schema = {c.name: _get_polars_dtype(c) for c in table.columns}
+        with session_scope() as session:
+            if owner_ids is None and values is None:
+                rows = session.execute(sa_select(table)).all()
+            else:
+                column = table.c[cls.owner_column] if owner_ids is not None else table.c[cls.value_column]
+                filter_values = list(dict.fromkeys(owner_ids if owner_ids is not None else values))  # type: ignore[reportArgumentType]
+                rows = [
+                    row
+                    for i in range(0, len(filter_values), READ_CHUNK_SIZE)
+                    for row in session.execute(
+                        sa_select(table).where(column.in_(filter_values[i : i + READ_CHUNK_SIZE]))
+                    )
+                ]
+        return pl.DataFrame(rows, schema=schema, orient="row")
+
+
+class TrackArtist(Link, table=True):
+    __tablename__ = "track_artist"  # type: ignore[reportAssignmentType]
+    owner_column = "track_id"
+    value_column = "artist_id"
+
+    track_id: str = Field(primary_key=True)
+    position: int = Field(primary_key=True)
+    artist_id: str = Field(index=True)
+
+
+class AlbumArtist(Link, table=True):
+    __tablename__ = "album_artist"  # type: ignore[reportAssignmentType]
+    owner_column = "album_id"
+    value_column = "artist_id"
+
+    album_id: str = Field(primary_key=True)
+    position: int = Field(primary_key=True)
+    artist_id: str = Field(index=True)
+
+
+class AlbumTrack(Link, table=True):
+    __tablename__ = "album_track"  # type: ignore[reportAssignmentType]
+    owner_column = "album_id"
+    value_column = "track_id"
+
+    album_id: str = Field(primary_key=True)
+    position: int = Field(primary_key=True)
+    track_id: str = Field(index=True)
+
+
+class ArtistGenre(Link, table=True):
+    __tablename__ = "artist_genre"  # type: ignore[reportAssignmentType]
+    owner_column = "artist_id"
+    value_column = "genre"
+
+    artist_id: str = Field(primary_key=True)
+    position: int = Field(primary_key=True)
+    genre: str = Field(index=True)
+
+
 class Album(Named, table=True):
     album_type: str
     total_tracks: int
@@ -172,20 +626,56 @@ class Album(Named, table=True):
     genres: list[str] = Field(sa_type=JSON)
     label: str
 
+    _links = {"artist_ids": AlbumArtist, "track_ids": AlbumTrack}
+
     @classmethod
     def from_spotify(cls, item: dict[str, Any]) -> "Self":
-        item["artist_ids"] = [a["id"] for a in item["artists"]]
-        item["track_ids"] = [t["id"] for t in item["tracks"]["items"]]
-        return cls(**item)
+        return cls(**cls._spotify_row(item))
+
+    @classmethod
+    def _spotify_row(cls, item: dict[str, Any]) -> dict[str, Any]:
+        artist_ids = [a["id"] for a in item["artists"]]
+        track_ids = [t["id"] for t in item["tracks"]["items"]]
+        return {**item, "artist_ids": artist_ids, "track_ids": track_ids}
+
+    @classmethod
+    def select_artist_ids(cls) -> "Select":
+        return sa_select(col(AlbumArtist.artist_id))
+
+    @classmethod
+    def read_by_artists(cls, artist_ids: "Iterable[str]") -> list["Self"]:
+        return cls._read_linked(col(AlbumArtist.album_id), col(AlbumArtist.artist_id), artist_ids)
+
+    @classmethod
+    def read_by_tracks(cls, track_ids: "Iterable[str]") -> list["Self"]:
+        return cls._read_linked(col(AlbumTrack.album_id), col(AlbumTrack.track_id), track_ids)
 
 
 class Artist(Named, table=True):
     genres: list[str] = Field(sa_type=JSON)
 
+    _links = {"genres": ArtistGenre}
+
     @classmethod
     def from_spotify(cls, item: dict[str, Any]) -> "Self":
         return cls(**item)
 
+    @classmethod
+    def read_by_tracks(cls, track_ids: "Iterable[str]") -> list["Self"]:
+        return cls._read_linked(col(TrackArtist.artist_id), col(TrackArtist.track_id), track_ids)
+
+    @classmethod
+    def read_by_genres(cls, genres: "Iterable[str]") -> list["Self"]:
+        return cls._read_linked(col(ArtistGenre.artist_id), col(ArtistGenre.genre), genres)
+
+    @classmethod
+    def read_genre_counts(cls) -> dict[str, int]:
+        # Number of artists per genre, most common first
+        count = func.count().label("count")
+        statement = sa_select(col(ArtistGenre.genre), count).group_by(col(ArtistGenre.genre)).order_by(count.desc())
+        with session_scope() as session:
+            return dict(session.execute(statement).all())  # type: ignore[reportArgumentType]
+
 
 class Track(Named, table=True):
     album_id: str
@@ -195,11 +685,27 @@ class Track(Named, table=True):
     duration_ms: int
     explicit: bool
 
+    _links = {"artist_ids": TrackArtist}
+
     @classmethod
     def from_spotify(cls, item: dict[str, Any]) -> "Self":
-        item["album_id"] = item["album"]["id"]
-        item["artist_ids"] = [a["id"] for a in item["artists"]]
-        return cls(**item)
+        return cls(**cls._spotify_row(item))
+
+    @classmethod
+    def _spotify_row(cls, item: dict[str, Any]) -> dict[str, Any]:
+        return {**item, "album_id": item["album"]["id"], "artist_ids": [a["id"] for a in item["artists"]]}
+
+    @classmethod
+    def select_album_ids(cls) -> "Select":
+        return sa_select(col(cls.album_id))
+
+    @classmethod
+    def select_artist_ids(cls) -> "Select":
+        return sa_select(col(TrackArtist.artist_id))
+
+    @classmethod
+    def read_by_artists(cls, artist_ids: "Iterable[str]") -> list["Self"]:
+        return cls._read_linked(col(TrackArtist.track_id), col(TrackArtist.artist_id), artist_ids)
 
 
 class Features(BaseModel, table=True):
@@ -219,3 +725,116 @@ class Features(BaseModel, table=True):
     @classmethod
     def from_spotify(cls, item: dict[str, Any]) -> "Self":
         return cls(**item)
+
+
+class Playlist(Named, table=True):
+    owner_id: str
+    snapshot_id: str
+    total_tracks: int
+
+    @classmethod
+    def from_spotify(cls, item: dict[str, Any]) -> "Self":
+        return cls(**cls._spotify_row(item))
+
+    @classmethod
+    def _spotify_row(cls, item: dict[str, Any]) -> dict[str, Any]:
+        return {**item, "owner_id": item["owner"]["id"], "total_tracks": item["tracks"]["total"]}
+
+
+class PlaylistTrack(BaseModel, table=True):
+    __tablename__ = "playlist_track"  # type: ignore[reportAssignmentType]
+
+    # ID is `{playlist_id}:{position}`, since a track can appear in a playlist more than once
+    playlist_id: str = Field(index=True)
+    track_id: str
+    position: int
+    added_at: datetime | None = Field(
+        default=None,
+        sa_type=TIMESTAMP(timezone=True),  # type: ignore[reportArgumentType]
+    )  # `None` for tracks added to very old playlists
+
+    @classmethod
+    def from_spotify(cls, item: dict[str, Any], playlist_id: str, position: int) -> "Self":
+        added_at = item["added_at"]
+        return cls(
+            id=f"{playlist_id}:{position}",
+            playlist_id=playlist_id,
+            track_id=item["track"]["id"],
+            position=position,
+            added_at=datetime.fromisoformat(added_at.replace("Z", "+00:00")) if added_at is not None else None,
+        )
+
+    @classmethod
+    def replace_playlist(cls, playlist_id: str, objs: "Iterable[Self]"):
+        # Replace all tracks of a playlist in a single transaction
+        now = _utc_now()
+        to_create = []
+        for obj in objs:
+            assert obj.playlist_id == playlist_id
+            obj.create_ts = now
+            obj.update_ts = now
+            to_create.append(obj.model_dump())
+        with session_scope() as session:
+            cls._set_change_seq(session, to_create)
+            session.execute(delete(cls).where(col(cls.playlist_id) == playlist_id))
+            if len(to_create) > 0:
+                session.execute(insert(cls), to_create)
+
+    @classmethod
+    def delete_playlists(cls, playlist_ids: "Iterable[str]") -> int:
+        # Delete all tracks of the given playlists; returns rows deleted
+        unique_ids = list(dict.fromkeys(playlist_ids))
+        num_deleted = 0
+        with session_scope() as session:
+            for i in range(0, len(unique_ids), READ_CHUNK_SIZE):
+                chunk = unique_ids[i : i + READ_CHUNK_SIZE]
+                result = session.execute(delete(cls).where(col(cls.playlist_id).in_(chunk)))
+                num_deleted += result.rowcount  # type: ignore[reportAttributeAccessIssue]
+        return num_deleted
+
+
+class SyncState(BaseModel, table=True):
+    __tablename__ = "sync_state"  # type: ignore[reportAssignmentType]
+
+    # ID is the Spotify user ID; tracks the newest saved track already synced for that user
+    added_at: datetime | None = Field(
+        default=None,
+        sa_type=TIMESTAMP(timezone=True),  # type: ignore[reportArgumentType]
+    )
+    track_id: str | None = None
+
+
+class RunState(BaseModel, table=True):
+    __tablename__ = "run_state"  # type: ignore[reportAssignmentType]
+
+    # ID is the workflow name; the IDs a run set out to fetch and how many of them are already saved
+    ids: list[str] = Field(sa_type=JSON)
+    num_done: int = 0
+    num_rows: int = 0
+
+    @property
+    def finished(self) -> bool:
+        return self.num_done >= len(self.ids)
+
+    @classmethod
+    def advance(cls, id: str, num_ids: int, num_rows: int):
+        # Only touch the counters, since rewriting `ids` on every batch would cost as much as the batch itself; the
+        # stored hash no longer matches, so clear it
+        with session_scope() as session:
+            session.execute(
+                update(cls)
+                .where(col(cls.id) == id)
+                .values(
+                    num_done=col(cls.num_done) + num_ids,
+                    num_rows=col(cls.num_rows) + num_rows,
+                    update_ts=_utc_now(),
+                    content_hash=None,
+                    change_seq=_next_change_seq(session),
+                )
+            )
+
+
+def backfill_links():
+    # Called by `create_db`, e.g. for databases created before the link tables existed
+    for model in [Album, Artist, Track]:
+        model.backfill_links()
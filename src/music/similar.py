@@ -0,0 +1,180 @@
+import os
+import threading
+from typing import TYPE_CHECKING
+
+import numpy as np
+import polars as pl
+from scipy.spatial import KDTree
+
+from music.feature_store import COLUMNS, FeatureStore
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+# Define index; a KD-tree over standardized features, whose rows and statistics are persisted next to the feature
+# store it is built from
+INDEX_FILE = "similar.npz"
+LEAF_SIZE = 16  # points per tree leaf
+MAX_PENDING = 10_000  # rows added or changed since the last build, searched by brute force until the tree is rebuilt
+MAX_MOVED = 100  # changed rows; each widens every tree query, since it has to be skipped in the tree
+
+# Define columns compared; continuous ones only, since distances between keys or time signatures are meaningless, and
+# few enough dimensions for a KD-tree to beat brute force
+SIMILARITY_COLUMNS = [
+    "acousticness",
+    "danceability",
+    "energy",
+    "instrumentalness",
+    "liveness",
+    "loudness",
+    "speechiness",
+    "tempo",
+    "valence",
+]
+_COLUMN_POSITIONS = [COLUMNS.index(c) for c in SIMILARITY_COLUMNS]
+
+
+def _nearest(points: np.ndarray, candidates: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    # Brute force, vectorized over all queries at once; squared distances via |a|^2 - 2ab + |b|^2
+    sq_dists = (
+        (points**2).sum(axis=1)[:, None] - 2 * points @ candidates.T + (candidates**2).sum(axis=1)[None, :]
+    ).clip(min=0)
+    k = min(k, len(candidates))
+    nearest = np.argpartition(sq_dists, k - 1, axis=1)[:, :k] if k < len(candidates) else np.indices(sq_dists.shape)[1]
+    dists = np.sqrt(np.take_along_axis(sq_dists, nearest, axis=1))
+    order = np.argsort(dists, axis=1)
+    return np.take_along_axis(dists, order, axis=1), np.take_along_axis(nearest, order, axis=1)
+
+
+class SimilarIndex:
+    # Nearest neighbours by features; rows the feature store gains or changes after a build are searched by brute
+    # force, and merged into the tree once there are too many of them
+    def __init__(self, store: FeatureStore | None = None):
+        self.store = store or FeatureStore()
+        self.path = os.path.join(self.store.path, INDEX_FILE)
+        self._lock = threading.Lock()
+        self._tree: KDTree | None = None
+        self._ids = np.zeros(0, dtype=self.store.id_array.dtype)  # of tree rows, to detect rebuilt stores
+        self._mean = np.zeros(len(SIMILARITY_COLUMNS))
+        self._std = np.ones(len(SIMILARITY_COLUMNS))
+        self._generation = 0  # of the feature store when the tree was built
+        if os.path.exists(self.path):
+            self._load()
+        if self._is_stale():
+            self._build()
+        self._load_pending()
+
+    def __len__(self) -> int:
+        return self._num_rows
+
+    def _standardize(self, rows: np.ndarray) -> np.ndarray:
+        return (rows[:, _COLUMN_POSITIONS] - self._mean) / self._std
+
+    def _is_rebuilt(self) -> bool:
+        # The feature store was rebuilt since the tree was, so tree rows no longer match store rows
+        num_indexed = len(self._ids)
+        return len(self.store) < num_indexed or not np.array_equal(self.store.id_array[:num_indexed], self._ids)
+
+    def _is_stale(self) -> bool:
+        return (self._tree is None and len(self.store) > 0) or self._is_rebuilt()
+
+    def _load(self):
+        # Rebuild the tree over current values of the persisted rows, keeping the statistics they were standardized by
+        with np.load(self.path, allow_pickle=False) as f:
+            self._ids, self._mean, self._std = f["ids"], f["mean"], f["std"]
+        if not self._is_rebuilt() and len(self._ids) > 0:
+            self._tree = KDTree(self._standardize(self.store.array[: len(self._ids)]), leafsize=LEAF_SIZE)
+            self._generation = self.store.generation
+
+    def _load_pending(self):
+        # Rows added since the build, and tree rows changed since, which the tree must skip
+        changed_rows = self.store.get_changed_rows(self._generation)
+        moved_rows = changed_rows[changed_rows < len(self._ids)]
+        self._moved = np.zeros(len(self._ids), dtype=bool)
+        self._moved[moved_rows] = True
+        self._num_moved = len(moved_rows)
+        self._num_rows = len(self.store)
+        self._pending_rows = np.concatenate([moved_rows, np.arange(len(self._ids), len(self.store))])
+        self._pending = self._standardize(self.store.array[self._pending_rows])
+
+    def _build(self):
+        # Standardize with statistics of the whole library, so that no one column dominates distances
+        values = self.store.array[:, _COLUMN_POSITIONS].astype(np.float64)
+        self._mean = values.mean(axis=0) if len(values) > 0 else np.zeros(len(SIMILARITY_COLUMNS))
+        self._std = values.std(axis=0) if len(values) > 0 else np.ones(len(SIMILARITY_COLUMNS))
+        self._std[self._std == 0] = 1
+        self._tree = KDTree((values - self._mean) / self._std, leafsize=LEAF_SIZE) if len(values) > 0 else None
+        self._ids = np.array(self.store.id_array)
+        self._generation = self.store.generation
+
+        # Write atomically, so that readers never load a partial index
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, ids=self._ids, mean=self._mean, std=self._std)
+        os.replace(tmp_path, self.path)
+
+    def update(self) -> int:
+        # Pick up rows added to or changed in the feature store; rebuild if it was rebuilt, or once too many rows are
+        # pending
+        with self._lock:
+            self.store.update()
+            if self._is_stale():
+                self._build()
+            self._load_pending()
+            if len(self._pending_rows) > MAX_PENDING or self._num_moved > MAX_MOVED:
+                self._build()
+                self._load_pending()
+        return len(self)
+
+    def _query(self, points: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+        # Distances and feature store rows of the `k` nearest neighbours of each standardized point
+        k = min(k, len(self))
+        results = []
+        if self._tree is not None:
+            num_tree_rows = min(k + self._num_moved, len(self._ids))  # enough for `k` after skipping moved rows
+            dists, rows = self._tree.query(points, k=num_tree_rows, workers=-1 if len(points) > 1 else 1)
+            dists, rows = dists.reshape(len(points), -1), rows.reshape(len(points), -1)  # flat for `k=1`
+            if len(self._pending) == 0:
+                return dists, rows
+            if self._num_moved > 0:
+                dists = np.where(self._moved[rows], np.inf, dists)
+            results.append((dists, rows))
+        if len(self._pending) > 0:
+            dists, rows = _nearest(points, self._pending, k)
+            results.append((dists, self._pending_rows[rows]))
+        if len(results) == 0:
+            return np.zeros((len(points), 0)), np.zeros((len(points), 0), dtype=np.int64)
+        dists, rows = np.hstack([r[0] for r in results]), np.hstack([r[1] for r in results])
+        order = np.argsort(dists, axis=1)[:, :k]
+        return np.take_along_axis(dists, order, axis=1), np.take_along_axis(rows, order, axis=1)
+
+    def _to_frame(self, query_ids: "np.ndarray | None", dists: np.ndarray, rows: np.ndarray) -> pl.DataFrame:
+        # From flat arrays; building the frame once, after filtering in NumPy, keeps single queries cheap
+        columns = {"id": self.store.id_array[rows].astype(str), "distance": dists}
+        return pl.DataFrame(columns if query_ids is None else {"query_id": query_ids, **columns})
+
+    def similar_tracks(self, track_ids: "Iterable[str]", k: int = 10) -> pl.DataFrame:
+        # `k` nearest tracks to each of `track_ids`, nearest first, excluding the track itself
+        query_ids = list(track_ids)
+        query_rows = self.store.get_rows(query_ids)
+        dists, rows = self._query(self._standardize(self.store.array[query_rows]), k + 1)
+        is_other = rows != query_rows[:, None]
+        keep = is_other & (np.cumsum(is_other, axis=1) <= k)
+        return self._to_frame(np.repeat(query_ids, rows.shape[1])[keep.ravel()], dists[keep], rows[keep])
+
+    def similar_to_playlist(self, playlist_tracks: "Iterable[str]", k: int = 10) -> pl.DataFrame:
+        # `k` nearest tracks to the centroid of a playlist's tracks, excluding tracks already in it; tracks without
+        # features are skipped
+        query_rows = self.store.get_rows(id for id in dict.fromkeys(playlist_tracks) if id in self.store)
+        if len(query_rows) == 0:
+            return pl.DataFrame(schema={"id": pl.String, "distance": pl.Float64})
+        centroid = self._standardize(self.store.array[query_rows]).mean(axis=0, keepdims=True)
+        dists, rows = self._query(centroid, k + len(query_rows))
+        keep = ~np.isin(rows[0], query_rows)
+        return self._to_frame(None, dists[0, keep][:k], rows[0, keep][:k])
+
+
+if __name__ == "__main__":
+    index = SimilarIndex()
+    num_rows = index.update()
+    print(f"Indexed {num_rows} tracks")
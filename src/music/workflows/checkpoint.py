@@ -0,0 +1,58 @@
+import time
+from datetime import timedelta
+from typing import TYPE_CHECKING, Any
+
+from music.data import transaction
+from music.models import RunState
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterator
+
+    from music.models import BaseModel
+
+# Define how often progress is reported
+REPORT_INTERVAL = 10  # seconds
+
+
+def _report(name: str, num_done: int, total: int, num_fetched: int, elapsed: float):
+    # Throughput counts only IDs fetched by this process, so resumed runs don't look faster than they are
+    rate = num_fetched / elapsed if elapsed > 0 else 0.0
+    eta = timedelta(seconds=round((total - num_done) / rate)) if rate > 0 else "unknown"
+    print(f"{name}: {num_done}/{total} IDs, {rate:.1f} IDs/s, ETA {eta}")
+
+
+def run(
+    name: str,
+    model: "type[BaseModel]",
+    get_ids: "Callable[[], list[str]]",
+    iter_items: "Callable[[list[str]], Iterator[list[dict[str, Any] | None]]]",
+) -> int:
+    # Resume an unfinished run from its last saved batch, or start a new one over the IDs `get_ids` returns
+    states = RunState.read_many([name])
+    state = states[0] if len(states) > 0 else None
+    if state is None or state.finished:
+        state = RunState(id=name, ids=list(dict.fromkeys(get_ids())))
+        state.upsert()
+    else:
+        print(f"{name}: resuming after {state.num_done}/{len(state.ids)} IDs")
+
+    # Save each batch together with the progress it makes, so an interrupted run loses at most the batch in flight
+    num_done, num_rows = state.num_done, state.num_rows
+    start = last_report = time.perf_counter()
+    for items in iter_items(state.ids[num_done:]):
+        rows = model.rows_from_spotify([item for item in items if item is not None])  # `None` for unknown IDs
+        with transaction():
+            model.upsert_rows(rows)  # rows may exist already, e.g. saved by the pipeline meanwhile
+            RunState.advance(name, len(items), len(rows))
+        num_done += len(items)
+        num_rows += len(rows)
+
+        now = time.perf_counter()
+        if now - last_report >= REPORT_INTERVAL:
+            _report(name, num_done, len(state.ids), num_done - state.num_done, now - start)
+            last_report = now
+
+    elapsed = time.perf_counter() - start
+    _report(name, num_done, len(state.ids), num_done - state.num_done, elapsed)
+    print(f"{name}: saved {num_rows} rows in {elapsed:.1f}s")
+    return num_rows
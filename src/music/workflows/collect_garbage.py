@@ -0,0 +1,23 @@
+from sqlalchemy import union
+
+from music.data import transaction
+from music.models import Album, Artist, Features, Track
+
+
+def collect_garbage() -> dict[str, int]:
+    # Delete catalog rows no longer referenced by any track, e.g. after tracks were unsaved; albums go first, so that
+    # artists only referenced by pruned albums go too
+    with transaction():
+        num_albums = Album.delete_orphans(Track.select_album_ids())
+        num_artists = Artist.delete_orphans(union(Track.select_artist_ids(), Album.select_artist_ids()))
+        num_features = Features.delete_orphans(Track.select_ids())
+    return {"albums": num_albums, "artists": num_artists, "features": num_features}
+
+
+def main():
+    counts = collect_garbage()
+    print(", ".join(f"Deleted {n} orphaned {name}" for name, n in counts.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,35 +1,25 @@
-from typing import TYPE_CHECKING
+import functools
 
 from music import api
 from music.models import Features, Track
-
-if TYPE_CHECKING:
-    from spotipy.client import Spotify
-
-
-def get_features(client: "Spotify", ids: set[str]) -> list[Features]:
-    # Get features
-    features_dicts = api.get_features(client, ids)
-
-    return [Features.from_spotify(f) for f in features_dicts]
+from music.similar import SimilarIndex
+from music.workflows import checkpoint
 
 
 def main():
     # Get client
     client = api.get_general_client()
 
-    # Get tracks and track IDs
-    tracks = Track.read_many()
-    track_ids = {t.id for t in tracks}
-
-    # Get existing features
-    existing_features = Features.read_many()
-    existing_features_ids = {f.id for f in existing_features}
+    # Get and save new features batch by batch; an interrupted run resumes where it stopped
+    checkpoint.run(
+        "get_features",
+        Features,
+        lambda: Features.read_missing_ids(Track.select_ids()),
+        functools.partial(api.iter_features, client),
+    )
 
-    # Get and save new features
-    new_features_ids = track_ids - existing_features_ids
-    features = get_features(client, new_features_ids)
-    Features.create_many(features)
+    # Add new features to the similar-tracks index, and to the feature store behind it
+    SimilarIndex().update()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,49 @@
+from typing import TYPE_CHECKING
+
+from music import api
+from music.models import Playlist, PlaylistTrack
+
+if TYPE_CHECKING:
+    from spotipy.client import Spotify
+
+
+def get_playlist_tracks(client: "Spotify", id: str, max_workers: int | None = None) -> list[PlaylistTrack]:
+    # Get playlist tracks
+    tracks_dicts = api.get_playlist_tracks(client, id, max_workers=max_workers)
+
+    # Local files and unavailable tracks don't have an ID; positions still count them
+    return [
+        PlaylistTrack.from_spotify(t, playlist_id=id, position=i)
+        for i, t in enumerate(tracks_dicts)
+        if t["track"] is not None and t["track"]["id"] is not None
+    ]
+
+
+def main():
+    # Get client
+    client = api.get_user_client()
+
+    # Get playlists
+    playlists = [Playlist.from_spotify(p) for p in api.get_user_playlists(client)]
+
+    # Get snapshots of existing playlists
+    snapshot_ids = dict(Playlist.iter_many([p.id for p in playlists], columns=["id", "snapshot_id"]))
+
+    # Re-fetch tracks only for playlists whose snapshot changed
+    changed_playlists = [p for p in playlists if snapshot_ids.get(p.id) != p.snapshot_id]
+    for playlist in changed_playlists:
+        playlist_tracks = get_playlist_tracks(client, playlist.id)
+        PlaylistTrack.replace_playlist(playlist.id, playlist_tracks)
+
+    # Save playlists last, so an interrupted run re-fetches the playlists it didn't get to
+    Playlist.upsert_many(changed_playlists)
+
+    # Drop playlists no longer followed; tracks first, so an interrupted run still finds the playlists to drop
+    fetched_ids = {p.id for p in playlists}
+    removed_ids = [id for id in Playlist.read_frame(columns=["id"])["id"] if id not in fetched_ids]
+    PlaylistTrack.delete_playlists(removed_ids)
+    Playlist.delete_many(removed_ids)
+
+
+if __name__ == "__main__":
+    main()
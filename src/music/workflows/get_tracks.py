@@ -2,15 +2,25 @@ from datetime import datetime, timezone
 from typing import TYPE_CHECKING
 
 from music import api
-from music.models import Track
+from music.models import SyncState, Track
 
 if TYPE_CHECKING:
     from spotipy.client import Spotify
 
+# Define how far back the first sync for a user goes
+DEFAULT_SINCE = datetime(year=2024, month=1, day=1, tzinfo=timezone.utc)
 
-def get_tracks(client: "Spotify", since: datetime) -> list[Track]:
-    # Get tracks
-    tracks_dicts = api.get_user_saved_tracks(client, since=since)
+
+def get_tracks(client: "Spotify", state: SyncState) -> list[Track]:
+    # Get tracks newer than the last sync; pages are as large as possible so a daily sync is a single call
+    tracks_dicts = api.get_user_saved_tracks(
+        client, since=state.added_at or DEFAULT_SINCE, until_id=state.track_id, page_size=50
+    )
+
+    # Advance cursor to the newest saved track
+    if len(tracks_dicts) > 0:
+        state.added_at = api.parse_added_at(tracks_dicts[0])
+        state.track_id = tracks_dicts[0]["track"]["id"]
 
     return [Track.from_spotify(t["track"]) for t in tracks_dicts]
 
@@ -19,14 +29,19 @@ def main():
     # Get client
     client = api.get_user_client()
 
-    # Get tracks since specified date
-    since = datetime(year=2024, month=1, day=1, tzinfo=timezone.utc)
-    tracks = get_tracks(client, since)
+    # Get sync state
+    user_id = client.current_user()["id"]  # type: ignore[reportOptionalSubscript]
+    states = SyncState.read_many([user_id])
+    state = states[0] if len(states) > 0 else SyncState(id=user_id)
+
+    # Get tracks since last sync
+    tracks = get_tracks(client, state)
 
-    # Save new tracks
-    existing_tracks = Track.read_many([t.id for t in tracks])
-    new_tracks = set(tracks) - set(existing_tracks)
+    # Save new tracks, then record the sync as successful
+    existing_ids = {row.id for row in Track.iter_many([t.id for t in tracks], columns=["id"])}
+    new_tracks = [t for t in tracks if t.id not in existing_ids]
     Track.create_many(new_tracks)
+    state.upsert()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,192 @@
+import queue
+import threading
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from typing import TYPE_CHECKING, Any
+
+from sqlalchemy import union
+
+from music import api
+from music.models import Album, Artist, Features, SyncState, Track
+from music.similar import SimilarIndex
+from music.workflows.get_tracks import DEFAULT_SINCE
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+
+    from spotipy.client import Spotify
+
+    from music.models import BaseModel
+
+# Define queueing; full queues block upstream stages, so memory stays bounded however far ahead the source gets
+QUEUE_SIZE = 1000  # IDs
+BATCH_SIZE = 100  # IDs per downstream lookup
+POLL_INTERVAL = 0.1  # seconds between checks for a failed stage
+
+_DONE = object()
+
+
+class _Stopped(Exception):
+    # Raised in stages unblocked by another stage's failure
+    pass
+
+
+_write_lock = threading.Lock()  # SQLite allows one writer at a time; waiting here beats busy-timeout retries
+
+
+class _Channel:
+    # Bounded queue of IDs from one or more upstream stages; every ID is passed downstream at most once
+    def __init__(self, stop: threading.Event, num_producers: int = 1, maxsize: int = QUEUE_SIZE):
+        self.stop = stop
+        self.num_producers = num_producers
+        self._queue: queue.Queue = queue.Queue(maxsize=maxsize)
+        self._seen: set[str] = set()
+        self._lock = threading.Lock()
+
+    def _put(self, item: Any):
+        while not self.stop.is_set():
+            try:
+                self._queue.put(item, timeout=POLL_INTERVAL)
+            except queue.Full:
+                continue
+            return
+        raise _Stopped
+
+    def put_many(self, ids: "Iterable[str]"):
+        for id in ids:
+            with self._lock:
+                if id in self._seen:
+                    continue
+                self._seen.add(id)
+            self._put(id)
+
+    def close(self):
+        self._put(_DONE)
+
+    def _get(self, block: bool) -> Any:
+        while not self.stop.is_set():
+            try:
+                return self._queue.get(timeout=POLL_INTERVAL) if block else self._queue.get_nowait()
+            except queue.Empty:
+                if not block:
+                    return None
+        raise _Stopped
+
+    def iter_batches(self, batch_size: int = BATCH_SIZE) -> "Iterator[list[str]]":
+        # Wait for the first ID of a batch, then take whatever else is queued already
+        batch = []
+        num_open = self.num_producers
+        while num_open > 0:
+            item = self._get(block=len(batch) == 0)
+            if item is _DONE:
+                num_open -= 1
+            elif item is not None:
+                batch.append(item)
+            if len(batch) > 0 and (item is None or len(batch) >= batch_size or num_open == 0):
+                yield batch
+                batch = []
+
+
+def _run_tracks(client: "Spotify", state: SyncState, albums: _Channel, artists: _Channel, features: _Channel) -> int:
+    # Queue IDs still missing from earlier runs
+    albums.put_many(Album.read_missing_ids(Track.select_album_ids()))
+    artists.put_many(Artist.read_missing_ids(union(Track.select_artist_ids(), Album.select_artist_ids())))
+    features.put_many(Features.read_missing_ids(Track.select_ids()))
+
+    # Save new tracks page by page, queueing their IDs as soon as they are saved
+    pages = api.iter_user_saved_tracks(
+        client, since=state.added_at or DEFAULT_SINCE, until_id=state.track_id, page_size=50
+    )
+    num_tracks = 0
+    for page in pages:
+        if len(page) == 0:
+            continue
+        if num_tracks == 0:
+            newest = page[0]
+            state.added_at = api.parse_added_at(newest)
+            state.track_id = newest["track"]["id"]
+        rows = Track.rows_from_spotify([t["track"] for t in page])
+        with _write_lock:
+            Track.upsert_rows(rows)
+        num_tracks += len(rows)
+        albums.put_many(row["album_id"] for row in rows)
+        artists.put_many(id for row in rows for id in row["artist_ids"])
+        features.put_many(row["id"] for row in rows)
+
+    for channel in [albums, artists, features]:
+        channel.close()
+    return num_tracks
+
+
+def _run_lookups(
+    model: "type[BaseModel]", loader: api.BatchLoader, inputs: _Channel, artists: _Channel | None = None
+) -> int:
+    # Fetch and save rows that don't exist yet; albums pass their artist IDs on
+    num_rows = 0
+    for batch in inputs.iter_batches():
+        existing_ids = set(model.read_frame(batch, columns=["id"])["id"])
+        new_ids = [id for id in batch if id not in existing_ids]
+        items = [item for item in loader.get_many(new_ids) if item is not None]  # `None` for unknown IDs
+        rows = model.rows_from_spotify(items)
+        with _write_lock:
+            model.create_rows(rows)
+        num_rows += len(rows)
+        if artists is not None:
+            artists.put_many(id for row in rows for id in row["artist_ids"])
+    if artists is not None:
+        artists.close()
+    return num_rows
+
+
+def run(user_client: "Spotify", general_client: "Spotify", state: SyncState) -> dict[str, int]:
+    # Stages run concurrently and pass IDs on as soon as they are saved:
+    #   tracks -> albums -> artists
+    #          -> artists
+    #          -> features
+    stop = threading.Event()
+    albums = _Channel(stop)
+    artists = _Channel(stop, num_producers=2)  # from tracks and albums
+    features = _Channel(stop)
+    # Loaders are scoped to the run, so that no run sees items memoized by an earlier one
+    with (
+        api.get_album_loader(general_client) as album_loader,
+        api.get_artist_loader(general_client) as artist_loader,
+        api.get_features_loader(general_client) as features_loader,
+        ThreadPoolExecutor(max_workers=4) as executor,
+    ):
+        futures = {
+            "tracks": executor.submit(_run_tracks, user_client, state, albums, artists, features),
+            "albums": executor.submit(_run_lookups, Album, album_loader, albums, artists),
+            "artists": executor.submit(_run_lookups, Artist, artist_loader, artists),
+            "features": executor.submit(_run_lookups, Features, features_loader, features),
+        }
+
+        # Stop every stage as soon as one fails, rather than leaving the others blocked on their queues
+        done, _ = wait(futures.values(), return_when=FIRST_EXCEPTION)
+        errors = [f.exception() for f in done if f.exception() is not None]
+        if len(errors) > 0:
+            stop.set()
+            raise errors[0]  # type: ignore[reportGeneralTypeIssues]
+        return {name: future.result() for name, future in futures.items()}
+
+
+def main():
+    # Get clients
+    user_client = api.get_user_client()
+    general_client = api.get_general_client()
+
+    # Get sync state
+    user_id = user_client.current_user()["id"]  # type: ignore[reportOptionalSubscript]
+    states = SyncState.read_many([user_id])
+    state = states[0] if len(states) > 0 else SyncState(id=user_id)
+
+    # Run every stage, then record the sync as successful
+    counts = run(user_client, general_client, state)
+    state.upsert()
+    print(", ".join(f"Saved {n} {name}" for name, n in counts.items()))
+
+    # Add new features to the similar-tracks index
+    SimilarIndex().update()
+
+
+if __name__ == "__main__":
+    main()
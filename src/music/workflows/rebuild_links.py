@@ -0,0 +1,12 @@
+from music.models import Album, Artist, Track
+
+
+def main():
+    # Rebuild link tables from the JSON list columns, e.g. after editing the database by hand; `create_db` already
+    # backfills empty ones, and writes keep them in sync afterwards
+    for model in [Album, Artist, Track]:
+        model.rebuild_links()
+
+
+if __name__ == "__main__":
+    main()
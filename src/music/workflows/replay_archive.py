@@ -0,0 +1,54 @@
+import itertools
+from typing import TYPE_CHECKING, Any
+
+from music import api
+from music.data import transaction
+from music.models import Album, Artist, Features, Track
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    from music.archive import Archive
+    from music.models import BaseModel
+
+# Define how archived endpoints map to models, in replay order; later endpoints win for the same ID. Playlists are left
+# out: archived tracks are kept per position, so they can't tell which ones a snapshot still has, and a playlist
+# restored without its tracks would look up to date to `get_playlists`
+REPLAYS: "dict[str, tuple[type[BaseModel], Callable[[dict[str, Any]], dict[str, Any]]]]" = {
+    "saved-tracks": (Track, lambda item: item["track"]),
+    "tracks": (Track, lambda item: item),
+    "albums": (Album, lambda item: item),
+    "artists": (Artist, lambda item: item),
+    "audio-features": (Features, lambda item: item),
+}
+BATCH_SIZE = 10_000
+
+
+def replay(archive: "Archive", endpoint: str) -> int:
+    # Upsert the latest archived payload per ID, without touching the API
+    model, get_item = REPLAYS[endpoint]
+    items = (get_item(item) for item in archive.iter_latest(endpoint))
+    num_rows = 0
+    while len(batch := list(itertools.islice(items, BATCH_SIZE))) > 0:
+        model.upsert_rows(model.rows_from_spotify(batch))
+        num_rows += len(batch)
+    return num_rows
+
+
+def main():
+    # Get archive
+    archive = api.get_archive()
+    if archive is None:
+        raise ValueError("Archive is disabled; set `MUSIC_ARCHIVE_PATH` to enable it.")
+
+    # Rebuild tables in a single transaction
+    endpoints = set(archive.get_endpoints())
+    with transaction():
+        for endpoint in REPLAYS:
+            if endpoint in endpoints:
+                num_rows = replay(archive, endpoint)
+                print(f"Replayed {num_rows} {endpoint}")
+
+
+if __name__ == "__main__":
+    main()
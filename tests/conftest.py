@@ -1,10 +1,28 @@
 import os
+from typing import TYPE_CHECKING
+
+import pytest
 
 os.environ["TEST"] = "true"  # mark test before any imports
 
 
 import music.models  # noqa: F401  # import models before creating database
+from music import api
 from music.data import create_db
 
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
 # Create database
 create_db()
+
+
+@pytest.fixture(scope="session", autouse=True)
+def archive_path(tmp_path_factory: "pytest.TempPathFactory") -> "Iterator[str]":
+    # Archive test fetches into a throwaway directory, which pytest cleans up after a few runs
+    path = str(tmp_path_factory.mktemp("archive"))
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setenv("MUSIC_ARCHIVE_PATH", path)
+        api.get_archive.cache_clear()
+        yield path
+    api.get_archive.cache_clear()
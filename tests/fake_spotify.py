@@ -0,0 +1,241 @@
+import json
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import TYPE_CHECKING, Any
+from urllib.parse import parse_qs, urlsplit
+
+from spotipy.client import Spotify
+
+from music import api
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    from typing_extensions import Self
+
+# Define paging defaults; from Spotify documentation
+DEFAULT_LIMITS = {"me/tracks": 20, "me/playlists": 50, "playlists": 100}
+ADDED_AT_START = datetime(year=2024, month=12, day=31, tzinfo=timezone.utc)
+
+
+def make_id(i: int) -> str:
+    # Spotify IDs are 22 base-62 characters
+    return f"{i:022d}"
+
+
+def make_album(id: str) -> dict[str, Any]:
+    i = int(id)
+    return {
+        "album_type": "album",
+        "artists": [{"id": make_id(i % 1000)}],
+        "genres": [],
+        "id": id,
+        "label": "Label",
+        "name": f"Album {i}",
+        "release_date": "2020-01-01",
+        "release_date_precision": "day",
+        "total_tracks": 2,
+        "tracks": {"items": [{"id": make_id(2 * i)}, {"id": make_id(2 * i + 1)}]},
+        "uri": f"spotify:album:{id}",
+    }
+
+
+def make_artist(id: str) -> dict[str, Any]:
+    i = int(id)
+    return {"genres": [f"genre {i % 10}"], "id": id, "name": f"Artist {i}", "uri": f"spotify:artist:{id}"}
+
+
+def make_track(id: str) -> dict[str, Any]:
+    i = int(id)
+    return {
+        "album": {"id": make_id(i // 2)},
+        "artists": [{"id": make_id(i % 1000)}],
+        "disc_number": 1,
+        "duration_ms": 180000 + i % 120000,
+        "explicit": i % 2 == 0,
+        "id": id,
+        "name": f"Track {i}",
+        "track_number": i % 2 + 1,
+        "uri": f"spotify:track:{id}",
+    }
+
+
+def make_features(id: str) -> dict[str, Any]:
+    i = int(id)
+    return {
+        "acousticness": (i % 97) / 97,
+        "danceability": (i % 89) / 89,
+        "energy": (i % 83) / 83,
+        "id": id,
+        "instrumentalness": (i % 79) / 79,
+        "key": i % 12,
+        "liveness": (i % 73) / 73,
+        "loudness": -(i % 60) / 2,
+        "mode": i % 2,
+        "speechiness": (i % 71) / 71,
+        "tempo": 60 + i % 140,
+        "time_signature": 3 + i % 3,
+        "valence": (i % 67) / 67,
+    }
+
+
+def make_saved_track(i: int) -> dict[str, Any]:
+    # Ordered newest -> oldest, one track per minute
+    added_at = ADDED_AT_START - timedelta(minutes=i)
+    return {"added_at": added_at.strftime("%Y-%m-%dT%H:%M:%SZ"), "track": make_track(make_id(i))}
+
+
+def make_playlist(i: int, num_tracks: int) -> dict[str, Any]:
+    id = make_id(i)
+    return {
+        "description": "",
+        "id": id,
+        "name": f"Playlist {i}",
+        "owner": {"id": "user"},
+        "snapshot_id": f"snapshot{i}",
+        "tracks": {"total": num_tracks},
+        "uri": f"spotify:playlist:{id}",
+    }
+
+
+BATCH_ENDPOINTS = {
+    "albums": ("albums", make_album),
+    "artists": ("artists", make_artist),
+    "audio-features": ("audio_features", make_features),
+    "tracks": ("tracks", make_track),
+}
+
+
+class FakeSpotifyServer:
+    # Local stand-in for the Spotify Web API that serves synthetic data in Spotify's response shapes
+    def __init__(
+        self,
+        *,
+        num_saved_tracks: int = 1000,
+        num_playlists: int = 10,
+        num_playlist_tracks: int = 1000,
+        latency: float = 0.0,  # seconds
+        rate_limit_every: int | None = None,
+        error_every: int | None = None,
+        retry_after: int = 0,  # seconds
+    ):
+        self.num_saved_tracks = num_saved_tracks
+        self.num_playlists = num_playlists
+        self.num_playlist_tracks = num_playlist_tracks
+        self.latency = latency
+        self.rate_limit_every = rate_limit_every
+        self.error_every = error_every
+        self.retry_after = retry_after
+        self.num_requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host!s}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "Self":
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def get_client(self) -> Spotify:
+        client = Spotify(auth="fake", requests_session=api._build_session(use_cache=False))
+        client.prefix = f"{self.url}/v1/"
+        return client
+
+    def _count_request(self) -> int:
+        with self._lock:
+            self.num_requests += 1
+            return self.num_requests
+
+    def _page(
+        self, path: str, query: dict[str, list[str]], total: int, make_item: "Callable[[int], dict[str, Any]]"
+    ) -> dict[str, Any]:
+        default_limit = DEFAULT_LIMITS[path if path.startswith("me/") else path.split("/")[0]]
+        limit = int(query.get("limit", [default_limit])[0])
+        offset = int(query.get("offset", ["0"])[0])
+        items = [make_item(i) for i in range(offset, min(offset + limit, total))]
+        next_url = f"{self.url}/v1/{path}?offset={offset + limit}&limit={limit}" if offset + limit < total else None
+        return {
+            "href": f"{self.url}/v1/{path}?offset={offset}&limit={limit}",
+            "items": items,
+            "limit": limit,
+            "next": next_url,
+            "offset": offset,
+            "previous": None,
+            "total": total,
+        }
+
+    def handle(self, path: str, query: dict[str, list[str]]) -> tuple[int, dict[str, Any]]:
+        # Batch lookups
+        if path in BATCH_ENDPOINTS:
+            key, make_item = BATCH_ENDPOINTS[path]
+            ids = [id for id in query.get("ids", [""])[0].split(",") if id]
+            return 200, {key: [make_item(id) for id in ids]}
+
+        # Paged lookups
+        if path == "me/tracks":
+            page = self._page(path, query, self.num_saved_tracks, make_saved_track)
+        elif path == "me/playlists":
+            page = self._page(path, query, self.num_playlists, lambda i: make_playlist(i, self.num_playlist_tracks))
+        elif path.startswith("playlists/") and path.endswith(("/items", "/tracks")):
+            page = self._page(path, query, self.num_playlist_tracks, make_saved_track)
+        else:
+            return 404, {"error": {"status": 404, "message": "Not found."}}
+        return 200, page
+
+    def _make_handler(self) -> type[BaseHTTPRequestHandler]:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep connections alive
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                # Maybe inject latency, rate limits, and errors
+                num_requests = server._count_request()
+                if server.latency > 0:
+                    time.sleep(server.latency)
+                headers = {}
+                if server.rate_limit_every is not None and num_requests % server.rate_limit_every == 0:
+                    status, body = 429, {"error": {"status": 429, "message": "API rate limit exceeded"}}
+                    headers["Retry-After"] = str(server.retry_after)
+                elif server.error_every is not None and num_requests % server.error_every == 0:
+                    status, body = 500, {"error": {"status": 500, "message": "Server error."}}
+                else:
+                    url = urlsplit(self.path)
+                    path = url.path.removeprefix("/v1/").strip("/")
+                    status, body = server.handle(path, parse_qs(url.query))
+
+                # Respond
+                content = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(content)))
+                for k, v in headers.items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, format: str, *args):
+                pass
+
+        return Handler
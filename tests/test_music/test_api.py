@@ -1,11 +1,16 @@
-from datetime import datetime, timezone
-from typing import TYPE_CHECKING
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import TYPE_CHECKING, Any
 
 import pytest
+from spotipy.exceptions import SpotifyException
 
 from music import api
+from tests.fake_spotify import FakeSpotifyServer, make_id
 
 if TYPE_CHECKING:
+    from collections.abc import Iterator
+
     from spotipy.client import Spotify
 
 
@@ -63,3 +68,163 @@ def test_get_features(general_client: "Spotify"):
     track_ids = ["7ouMYWpwJ422jRcDASZB7P", "4VqPOruhp5EdPBeR92t6lQ"]
     features = api.get_features(general_client, track_ids)
     assert len(features) == 2
+
+
+def test_handle_chunked_ids_concurrent(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(api, "BACKOFF_MIN", 0.0)
+
+    # Spoof an endpoint that rate limits the first call
+    calls = []
+
+    def func(ids: list[str]) -> dict[str, list[dict[str, str]]]:
+        calls.append(ids)
+        if len(calls) == 1:
+            raise SpotifyException(429, -1, "rate limited", headers={"Retry-After": "0"})
+        return {"items": [{"id": i} for i in ids]}
+
+    ids = [str(i) for i in range(95)]
+    chunked_ids = api._chunk_list(ids, chunk_size=10)
+    items = api._handle_chunked_ids(func, total=len(ids), chunked_ids=chunked_ids, key="items", max_workers=4)
+    assert [i["id"] for i in items] == ids
+    assert len(calls) == len(chunked_ids) + 1
+
+
+def test_handle_next_concurrent():
+    # Spoof a paged endpoint
+    total = 95
+    offsets = []
+
+    def func(limit: int = 10, offset: int = 0) -> dict[str, Any]:
+        offsets.append(offset)
+        items = [{"index": i} for i in range(offset, min(offset + limit, total))]
+        return {"items": items, "limit": limit, "offset": offset, "total": total}
+
+    # All pages
+    items = api._handle_next(None, func, max_workers=4)  # type: ignore[reportArgumentType]  # client is only used without workers
+    assert [i["index"] for i in items] == list(range(total))
+
+    # Limit
+    items = api._handle_next(None, func, limit=25, max_workers=4)  # type: ignore[reportArgumentType]
+    assert [i["index"] for i in items] == list(range(25))
+
+    # Early break; no more than `max_workers` pages are requested past the cutoff
+    offsets.clear()
+    items = api._handle_next(None, func, early_break=lambda i: i[-1]["index"] >= 30, max_workers=2)  # type: ignore[reportArgumentType]
+    assert [i["index"] for i in items] == list(range(40))
+    assert max(offsets) <= 50
+
+
+def test_iter_user_saved_tracks():
+    # Spoof a client with saved tracks ordered newest -> oldest, one per day
+    class Client:
+        total = 45
+
+        def current_user_saved_tracks(self, limit: int = 20, offset: int = 0) -> dict[str, Any]:
+            items = [
+                {"added_at": f"{date(2024, 3, 31) - timedelta(days=i)}T00:00:00Z", "track": {"id": str(i)}}
+                for i in range(offset, min(offset + limit, self.total))
+            ]
+            next = offset + limit if offset + limit < self.total else None
+            return {"items": items, "limit": limit, "offset": offset, "total": self.total, "next": next}
+
+        def next(self, result: dict[str, Any]) -> dict[str, Any]:
+            return self.current_user_saved_tracks(offset=result["next"])
+
+    # Pages are yielded as they arrive and filtered by `since`
+    client = Client()
+    since = datetime(year=2024, month=3, day=10, tzinfo=timezone.utc)
+    pages = list(api.iter_user_saved_tracks(client, since=since))  # type: ignore[reportArgumentType]
+    assert [len(p) for p in pages] == [20, 2]
+    tracks = api.get_user_saved_tracks(client, since=since, max_workers=2)  # type: ignore[reportArgumentType]
+    assert [t["track"]["id"] for t in tracks] == [str(i) for i in range(22)]
+
+
+def test_batch_loader():
+    # Spoof an endpoint
+    calls = []
+
+    def func(ids: list[str]) -> dict[str, list[dict[str, str] | None]]:
+        calls.append(ids)
+        return {"items": [{"id": i} if i != "unknown" else None for i in ids]}
+
+    # Overlapping requests are deduplicated and packed into full batches; the rest waits for a flush
+    with api.BatchLoader(func, batch_size=4, key="items", wait=None, max_memo_size=5) as loader:
+        futures = loader.load_many(["a", "b", "c"])
+        futures2 = loader.load_many(["b", "c", "d", "e", "unknown"])
+        assert [f.result()["id"] for f in futures] == ["a", "b", "c"]
+        assert not futures2[-1].done()
+        loader.flush()
+        assert [f.result() for f in futures2][-1] is None
+        assert calls == [["a", "b", "c", "d"], ["e", "unknown"]]
+
+        # Memoized IDs are not requested again, up to `max_memo_size` of them
+        assert loader.get_many(["d", "e"]) == [{"id": "d"}, {"id": "e"}]
+        assert len(calls) == loader.num_calls == 2
+        assert loader.get_many(["f"]) == [{"id": "f"}]
+        assert loader.get_many(["a"]) == [{"id": "a"}]  # evicted, as the oldest
+        assert len(calls) == loader.num_calls == 4
+
+        # Closing the loader sends what is queued
+        future = loader.load("g")
+    assert future.result() == {"id": "g"}
+    assert len(loader._memo) == 0
+
+
+@pytest.fixture(scope="module")
+def fake_server() -> "Iterator[FakeSpotifyServer]":
+    with (
+        pytest.MonkeyPatch.context() as monkeypatch,
+        FakeSpotifyServer(num_saved_tracks=250, num_playlist_tracks=250, rate_limit_every=7) as server,
+    ):
+        monkeypatch.setattr(api, "BACKOFF_MIN", 0.0)  # retry injected 429s right away
+        yield server
+
+
+@pytest.mark.parametrize("max_workers", [None, 4])
+def test_fake_server(fake_server: FakeSpotifyServer, max_workers: int | None):
+    client = fake_server.get_client()
+    ids = [make_id(i) for i in range(120)]
+
+    # Batch lookups keep input order, even when rate limited
+    for func in [api.get_albums, api.get_artists, api.get_tracks, api.get_features]:
+        items = func(client, ids, max_workers=max_workers)
+        assert [i["id"] for i in items] == ids
+
+    # Paged lookups
+    tracks = api.get_user_saved_tracks(client, max_workers=max_workers)
+    assert [t["track"]["id"] for t in tracks] == [make_id(i) for i in range(250)]
+    tracks2 = api.get_playlist_tracks(client, make_id(0), limit=150, max_workers=max_workers)
+    assert len(tracks2) == 150
+    playlists = api.get_user_playlists(client, max_workers=max_workers)
+    assert len(playlists) == 10
+
+
+def test_fake_server_rate_limit():
+    # 429s reach the shared rate limiter, which honors `Retry-After`, rather than being retried by each request
+    retry_afters = []
+
+    class RateLimiter(api._RateLimiter):
+        def penalize(self, retry_after: float | None = None):
+            retry_afters.append(retry_after)
+            super().penalize(retry_after)
+
+    with FakeSpotifyServer(rate_limit_every=2, retry_after=1) as server:
+        client = server.get_client()
+        limiter = RateLimiter()
+        start = time.perf_counter()
+        for i in range(2):
+            result = api._call_with_retry(client.albums, limiter, [make_id(i)])
+            assert result["albums"][0]["id"] == make_id(i)
+        assert time.perf_counter() - start >= 1
+    assert retry_afters == [1.0]
+    assert server.num_requests == 3
+
+
+def test_fake_server_until_id(fake_server: FakeSpotifyServer):
+    client = fake_server.get_client()
+
+    # Stop on the first page that reaches an already known track
+    num_requests = fake_server.num_requests
+    tracks = api.get_user_saved_tracks(client, until_id=make_id(30), page_size=50)
+    assert [t["track"]["id"] for t in tracks] == [make_id(i) for i in range(30)]
+    assert fake_server.num_requests - num_requests <= 2  # one page, plus maybe an injected 429
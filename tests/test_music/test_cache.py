@@ -0,0 +1,88 @@
+import json
+from typing import TYPE_CHECKING
+
+import requests
+from requests.adapters import BaseAdapter
+
+from music.cache import TOKEN_REFRESH_MARGIN, CachedSession, ResponseCache, TokenCacheHandler
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+class FakeAdapter(BaseAdapter):
+    def __init__(self):
+        super().__init__()
+        self.requests: list[requests.PreparedRequest] = []
+
+    def send(self, request: requests.PreparedRequest, **kwargs) -> requests.Response:
+        self.requests.append(request)
+        response = requests.Response()
+        response.request = request
+        response.url = request.url  # type: ignore[reportAttributeAccessIssue]
+        if request.headers.get("If-None-Match") == '"v1"':
+            response.status_code = 304
+            response._content = b""
+        else:
+            response.status_code = 200
+            response._content = json.dumps({"url": request.url}).encode()
+            response.headers["Content-Type"] = "application/json"
+            response.headers["ETag"] = '"v1"'
+        return response
+
+    def close(self):
+        pass
+
+
+def test_cached_session(tmp_path: "Path"):
+    cache = ResponseCache(str(tmp_path / "responses.cache"))
+    session = CachedSession(cache)
+    adapter = FakeAdapter()
+    session.mount("https://", adapter)
+
+    # Miss, then hit
+    url = "https://api.spotify.com/v1/albums/"
+    response = session.request("GET", url, params={"ids": "a,b"})
+    assert response.json() == {"url": f"{url}?ids=a%2Cb"}
+    response2 = session.request("GET", url, params={"ids": "a,b"})
+    assert response2.json() == response.json()
+    assert len(adapter.requests) == 1
+    assert cache.stats == {"hits": 1, "misses": 1, "revalidations": 0}
+
+    # User endpoints are never cached
+    session.request("GET", "https://api.spotify.com/v1/me/tracks", params={"limit": 20})
+    session.request("GET", "https://api.spotify.com/v1/me/tracks", params={"limit": 20})
+    assert len(adapter.requests) == 3
+
+    # Expired entries are revalidated with their ETag
+    cache.ttls["albums"] = -1
+    session.request("GET", url, params={"ids": "c"})
+    response3 = session.request("GET", url, params={"ids": "c"})
+    assert adapter.requests[-1].headers["If-None-Match"] == '"v1"'
+    assert response3.json() == {"url": f"{url}?ids=c"}
+    assert cache.revalidations == 1
+
+    # Least recently used entries are evicted beyond the size cap
+    cache.ttls["albums"] = 60
+    cache.max_size = len(response3.content)
+    session.request("GET", url, params={"ids": "d"})
+    assert cache.get(f"{url}?ids=d") is not None
+    assert cache.get(f"{url}?ids=c") is None
+
+
+def test_token_cache_handler(tmp_path: "Path"):
+    cache_path = tmp_path / "token.cache"
+    token_info = {"access_token": "token", "expires_at": 1000}
+    cache_path.write_text(json.dumps(token_info))
+
+    # Token is read once and reported as expiring early
+    handler = TokenCacheHandler(str(cache_path))
+    assert handler.get_cached_token() == {"access_token": "token", "expires_at": 1000 - TOKEN_REFRESH_MARGIN}
+    cache_path.unlink()
+    assert handler.get_cached_token() is not None
+
+    # File is only written when the token changes
+    handler.save_token_to_cache(token_info)
+    assert not cache_path.exists()
+    handler.save_token_to_cache({"access_token": "token2", "expires_at": 2000})
+    assert json.loads(cache_path.read_text())["access_token"] == "token2"
@@ -0,0 +1,67 @@
+from typing import TYPE_CHECKING
+
+import pytest
+from sqlalchemy import delete, text
+
+from music.data import _get_engine, create_db, get_session, session_scope, transaction
+from music.models import Artist, Track, TrackArtist
+from tests.fake_spotify import make_id, make_track
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+def test_engine():
+    # Engine is cached
+    assert _get_engine() is _get_engine()
+
+    # Pragmas are applied
+    with get_session() as session:
+        journal_mode = session.execute(text("PRAGMA journal_mode")).scalar()
+        synchronous = session.execute(text("PRAGMA synchronous")).scalar()
+    assert journal_mode == "wal"
+    assert synchronous == 1  # NORMAL
+
+
+def test_transaction():
+    artist = Artist(id="transaction_artist", name="name", uri="uri", genres=[])
+
+    # Operations share one session and are committed at the end
+    with transaction() as session:
+        artist.create()
+        assert artist in Artist.read_many([artist.id])
+        with transaction() as session2:
+            assert session2 is session
+        with transaction(session) as session3:
+            assert session3 is session
+        with get_session() as other, pytest.raises(ValueError), transaction(other):
+            pass
+    assert artist in Artist.read_many([artist.id])
+
+    # Failed transactions are rolled back
+    artist2 = Artist(id="transaction_artist2", name="name", uri="uri", genres=[])
+    with pytest.raises(RuntimeError), transaction():
+        artist2.create()
+        raise RuntimeError
+    assert Artist.read_many([artist2.id]) == []
+
+    # Clean up
+    with transaction():
+        Artist.read_id(artist.id).delete()
+    assert Artist.read_many([artist.id]) == []
+
+
+def test_create_db(tmp_path: "Path", monkeypatch: pytest.MonkeyPatch):
+    # In a database of its own, since link tables are only backfilled when all of them are empty
+    monkeypatch.setenv("MUSIC_DB_URL", f"sqlite:///{tmp_path / 'test.db'}")
+    create_db()
+    rows = Track.rows_from_spotify([make_track(make_id(i)) for i in range(3)])
+    Track.create_rows(rows)
+    links = TrackArtist.read_frame()
+
+    # Links missing, e.g. from before link tables existed, are backfilled
+    with session_scope() as session:
+        session.execute(delete(TrackArtist))
+    create_db()
+    assert TrackArtist.read_frame().equals(links)
+    assert not Track.backfill_links()
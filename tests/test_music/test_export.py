@@ -0,0 +1,56 @@
+from datetime import timedelta
+from typing import TYPE_CHECKING
+
+import polars as pl
+
+from music import export
+from music.models import Artist, Features, Track
+from tests.fake_spotify import make_artist, make_features, make_id, make_track
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    import pytest
+
+
+def test_export(tmp_path: "Path", monkeypatch: "pytest.MonkeyPatch"):
+    path = str(tmp_path)
+    ids = [make_id(i) for i in range(20)]
+    Track.create_rows(Track.rows_from_spotify([make_track(id) for id in ids]))
+    Features.create_rows(Features.rows_from_spotify([make_features(id) for id in ids]))
+    Artist.create_rows(Artist.rows_from_spotify([make_artist(make_id(i)) for i in range(20)]))
+
+    # Full export
+    counts, compaction = export.export_all(path)
+    compaction.result()
+    assert counts["track"] == counts["features"] == counts[export.TRACK_FEATURES] == len(ids)
+    df = export.scan(export.TRACK_FEATURES, path).collect().sort("id")
+    assert df["id"].to_list() == ids
+    assert df.filter(pl.col("id") == make_id(1)).row(0, named=True)["artists"] == ["Artist 1"]
+
+    # Only rows whose sources changed are replaced
+    Artist.upsert_rows(Artist.rows_from_spotify([{**make_artist(make_id(1)), "name": "Renamed"}]))
+    assert export.export_track_features(path) == 1
+    assert export.export_model(Track, path) == 0
+    df2 = export.scan(export.TRACK_FEATURES, path).collect()
+    assert len(df2) == len(ids)
+    assert df2.filter(pl.col("id") == make_id(1)).row(0, named=True)["artists"] == ["Renamed"]
+
+    # Rows are exported by when they were committed, however old their timestamps; unchanged rows aren't re-exported
+    [row] = Track.rows_from_spotify([{**make_track(ids[0]), "name": "Late"}])
+    Track.upsert_rows([{**row, "update_ts": row["update_ts"] - timedelta(hours=1)}])
+    Track.upsert_rows(Track.rows_from_spotify([make_track(id) for id in ids[1:]]))
+    assert export.export_model(Track, path) == 1
+    assert export.scan("track", path).filter(pl.col("id") == ids[0]).collect()["name"].to_list() == ["Late"]
+
+    # Compaction merges parts and drops deleted rows
+    monkeypatch.setattr(export, "MAX_PARTS", 0)
+    Features.delete_many(ids[:5])
+    export.compact_all(path)
+    assert sorted(export.scan(export.TRACK_FEATURES, path).collect()["id"]) == ids[5:]
+    assert all(len(export._list_parts(p)) == 1 for p in (tmp_path / export.TRACK_FEATURES).glob("[0-9][0-9]"))
+
+    # Clean up
+    Track.delete_many(ids)
+    Features.delete_many(ids)
+    Artist.delete_many(make_id(i) for i in range(20))
@@ -0,0 +1,70 @@
+from datetime import timedelta
+from typing import TYPE_CHECKING
+
+import numpy as np
+import pytest
+
+from music import feature_store
+from music.feature_store import COLUMNS, FeatureStore
+from music.models import Features
+from tests.fake_spotify import make_features, make_id
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+def test_feature_store(tmp_path: "Path", monkeypatch: "pytest.MonkeyPatch"):
+    monkeypatch.setattr(feature_store, "INITIAL_CAPACITY", 4)
+    items = [make_features(make_id(i)) for i in range(10)]
+    Features.create_rows(Features.rows_from_spotify(items[:6]))
+
+    # Numeric columns, then one-hot `key` and `time_signature`
+    store = FeatureStore(str(tmp_path))
+    assert store.update() >= 6
+    row = store.array[store.get_rows([make_id(5)])[0]]
+    assert row.dtype == np.float32
+    assert row[COLUMNS.index("tempo")] == items[5]["tempo"]
+    assert row[COLUMNS.index("key_5")] == 1
+    assert row[COLUMNS.index("time_signature_5")] == 1
+    assert row[len(feature_store.NUMERIC_COLUMNS) :].sum() == 2
+
+    # Tensors share memory with the mapped matrix
+    tensor = store.tensor()
+    assert tensor.shape == (len(store), len(COLUMNS))
+    assert tensor.data_ptr() == store.array.ctypes.data
+
+    # New rows are appended, growing the files, and changed rows are overwritten in place; both are reported as
+    # changed, unlike rows re-read unchanged
+    position = store.get_rows([make_id(0)])[0]
+    generation = store.generation
+    Features.create_rows(Features.rows_from_spotify(items[6:]))
+    Features.upsert_rows(Features.rows_from_spotify([{**items[0], "tempo": 1.0}]))
+    store.update()
+    assert store.get_rows([make_id(0)])[0] == position
+    assert store.array[position, COLUMNS.index("tempo")] == 1.0
+    changed_ids = [make_id(i) for i in [0, 6, 7, 8, 9]]
+    assert sorted(store.get_changed_rows(generation)) == sorted(store.get_rows(changed_ids))
+
+    # Rows are picked up by when they were committed, however old their timestamps
+    [row] = Features.rows_from_spotify([{**items[1], "tempo": 2.0}])
+    Features.upsert_rows([{**row, "update_ts": row["update_ts"] - timedelta(hours=1)}])
+    assert store.update() == 1
+    assert store.array[store.get_rows([make_id(1)])[0], COLUMNS.index("tempo")] == 2.0
+
+    # Another reader maps the same rows
+    reader = FeatureStore(str(tmp_path))
+    ids = [make_id(i) for i in range(10)]
+    assert np.array_equal(reader.array[reader.get_rows(ids)], store.array[store.get_rows(ids)])
+
+    # Deleted rows are dropped by rebuilding, even if as many rows were added meanwhile
+    Features.delete_many([make_id(9)])
+    Features.create_rows(Features.rows_from_spotify([make_features(make_id(10))]))
+    ids.append(make_id(10))
+    store.update()
+    with pytest.raises(KeyError):
+        store.get_rows([make_id(9)])
+    assert make_id(10) in store
+    assert len(store) == Features.count()
+
+    # Clean up
+    Features.delete_many(ids)
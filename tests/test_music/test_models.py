@@ -1,4 +1,17 @@
-from music.models import Album, Artist, Features, Track
+import copy
+import itertools
+from datetime import datetime, timezone
+
+import pytest
+from pydantic import ValidationError
+from sqlalchemy.orm.exc import StaleDataError
+from sqlmodel import col, select
+
+from music import models
+from music.data import session_scope, transaction
+from music.models import Album, AlbumArtist, Artist, Features, Playlist, PlaylistTrack, SyncState, Track, TrackArtist
+from music.workflows.collect_garbage import collect_garbage
+from tests.fake_spotify import make_album, make_artist, make_features, make_id, make_track
 
 
 def test_artist():
@@ -52,6 +65,20 @@ def test_artist():
     read_artist3 = Artist.read_id(artist2.id)
     artist2.pkey = read_artist3.pkey  # get pkey
 
+    # Upsert from a generator skips unchanged rows
+    assert Artist.upsert_many(a for a in [artist, artist2]) == {"inserted": 0, "updated": 0, "unchanged": 2}
+    read_artist4 = Artist.read_id(artist2.id)
+    assert read_artist4.update_ts == read_artist3.update_ts
+
+    # Changed rows are updated, keeping creation timestamps
+    artist2.name = "name3"
+    assert Artist.upsert_many([artist, artist2]) == {"inserted": 0, "updated": 1, "unchanged": 1}
+    read_artist5 = Artist.read_id(artist2.id)
+    assert read_artist5.name == "name3"
+    assert read_artist5.create_ts == read_artist3.create_ts
+    assert read_artist5.update_ts > read_artist3.update_ts
+    assert read_artist5.pkey == read_artist3.pkey
+
     # Delete
     artist.delete()
     artist2.delete()
@@ -159,3 +186,299 @@ def test_track_features():
         "time_signature": 4,
         "valence": 0.211,
     }
+
+
+def test_playlist():
+    # No need to test CRUD; Artist already does that
+
+    # From Spotify
+    playlist_dict = {
+        "description": "",
+        "id": "3cEYpjA9oz9GiPac4AsH4n",
+        "name": "Spotify Web API Testing playlist",
+        "owner": {"id": "jmperezperez"},
+        "snapshot_id": "AAAAEZ5lGg6AMmA3LfOrWB2R5YTi9iqe",
+        "tracks": {"total": 5},
+        "uri": "spotify:playlist:3cEYpjA9oz9GiPac4AsH4n",
+    }
+    playlist = Playlist.from_spotify(playlist_dict)
+    assert playlist.model_dump(exclude={"pkey", "create_ts", "update_ts"}) == {
+        "id": "3cEYpjA9oz9GiPac4AsH4n",
+        "name": "Spotify Web API Testing playlist",
+        "uri": "spotify:playlist:3cEYpjA9oz9GiPac4AsH4n",
+        "owner_id": "jmperezperez",
+        "snapshot_id": "AAAAEZ5lGg6AMmA3LfOrWB2R5YTi9iqe",
+        "total_tracks": 5,
+    }
+
+
+def test_playlist_track():
+    # From Spotify
+    item = {"added_at": "2015-01-15T12:39:22Z", "track": {"id": "4rzfv0JLZfVhOhbSQ8o5jZ"}}
+    playlist_track = PlaylistTrack.from_spotify(item, playlist_id="playlist", position=0)
+    assert playlist_track.model_dump(exclude={"pkey", "create_ts", "update_ts"}) == {
+        "id": "playlist:0",
+        "playlist_id": "playlist",
+        "track_id": "4rzfv0JLZfVhOhbSQ8o5jZ",
+        "position": 0,
+        "added_at": datetime(2015, 1, 15, 12, 39, 22, tzinfo=timezone.utc),
+    }
+
+    # Very old playlists have no `added_at`
+    assert PlaylistTrack.from_spotify({**item, "added_at": None}, playlist_id="playlist", position=0).added_at is None
+
+    # Replace
+    PlaylistTrack.replace_playlist("playlist", [playlist_track, PlaylistTrack.from_spotify(item, "playlist", 1)])
+    PlaylistTrack.replace_playlist("playlist", [PlaylistTrack.from_spotify(item, "playlist", 0)])
+    assert [t.id for t in PlaylistTrack.read_all()] == ["playlist:0"]
+
+
+def test_read_many_large(monkeypatch: "pytest.MonkeyPatch"):
+    artists = [Artist(id=f"large_artist{i}", name="name", uri="uri", genres=[]) for i in range(25)]
+    Artist.create_many(artists)
+    ids = [a.id for a in artists] + ["missing", artists[0].id]
+
+    # Chunked
+    monkeypatch.setattr(models, "READ_CHUNK_SIZE", 10)
+    assert set(Artist.read_many(ids)) == set(artists)
+    assert len(Artist.read_many(ids)) == len(artists)
+
+    # Temporary table
+    monkeypatch.setattr(models, "READ_TEMP_TABLE_THRESHOLD", 10)
+    assert set(Artist.read_many(ids)) == set(artists)
+    assert len(Artist.read_many(ids)) == len(artists)
+
+    # Clean up
+    for artist in Artist.read_many(ids):
+        artist.delete()
+
+
+def test_read_frame():
+    album_dict = {
+        "album_type": "album",
+        "artists": [{"id": "4tZwfgrHOc3mvqYlEYSvVi"}],
+        "genres": [],
+        "id": "frame_album",
+        "label": "Walt Disney Records",
+        "name": "TRON: Legacy Reconfigured",
+        "release_date": "2011-01-01",
+        "release_date_precision": "day",
+        "total_tracks": 2,
+        "tracks": {"items": [{"id": "4lteJuSjb9Jt9W1W7PIU2U"}, {"id": "66uVqkmHAc0MBUzoPhIypN"}]},
+        "uri": "spotify:album:382ObEPsp2rxGrnsizN5TX",
+    }
+    album = Album.from_spotify(album_dict)
+    album.create()
+
+    # All columns
+    df = Album.read_frame([album.id])
+    assert df.to_dicts()[0]["create_ts"] == album.create_ts
+    assert df.drop("pkey").to_dicts() == [album.model_dump(exclude={"pkey"})]
+
+    # Projected columns
+    df2 = Album.read_frame([album.id], columns=["id", "artist_ids"])
+    assert df2.to_dicts() == [{"id": album.id, "artist_ids": ["4tZwfgrHOc3mvqYlEYSvVi"]}]
+
+    # Clean up
+    Album.read_id(album.id).delete()
+    assert Album.read_frame([album.id]).is_empty()
+
+
+def test_iter_many(monkeypatch: "pytest.MonkeyPatch"):
+    rows = Artist.rows_from_spotify([make_artist(make_id(i)) for i in range(25)])
+    Artist.create_rows(rows)
+    ids = [row["id"] for row in rows]
+
+    # Projected columns, as named tuples
+    records = list(Artist.iter_many(ids, columns=["id", "genres"], batch_size=4))
+    assert [tuple(r) for r in records] == [(row["id"], row["genres"]) for row in rows]
+    assert records[0].genres == rows[0]["genres"]
+
+    # Temporary table, and full scans stop as soon as the consumer does
+    monkeypatch.setattr(models, "READ_TEMP_TABLE_THRESHOLD", 10)
+    assert {r.id for r in Artist.iter_many(ids, columns=["id"])} == set(ids)
+    assert len(list(itertools.islice(Artist.iter_many(batch_size=2), 3))) == 3
+
+    # Stopping early on a temporary table drops it, also within a transaction
+    with transaction():
+        records = Artist.iter_many(ids, batch_size=2)
+        next(records)
+        records.close()
+        assert len(Artist.read_many(ids)) == 25
+
+    # Clean up
+    Artist.delete_many(ids)
+
+
+def test_read_missing_ids():
+    track = Track(
+        id="missing_track",
+        name="name",
+        uri="uri",
+        album_id="missing_album",
+        artist_ids=["missing_artist", "missing_artist2"],
+        disc_number=1,
+        track_number=1,
+        duration_ms=1,
+        explicit=False,
+    )
+    track.create()
+    artist = Artist(id="missing_artist", name="name", uri="uri", genres=[])
+    artist.create()
+
+    # Referenced IDs without rows
+    assert Album.read_missing_ids(Track.select_album_ids()) == ["missing_album"]
+    assert Artist.read_missing_ids(Track.select_artist_ids()) == ["missing_artist2"]
+    assert Features.read_missing_ids(Track.select_ids()) == ["missing_track"]
+
+    # Clean up
+    Track.read_id(track.id).delete()
+    Artist.read_id(artist.id).delete()
+
+
+def test_links():
+    def make_track(id: str, artist_ids: list[str]) -> Track:
+        return Track(
+            id=id,
+            name="name",
+            uri="uri",
+            album_id="album",
+            artist_ids=artist_ids,
+            disc_number=1,
+            track_number=1,
+            duration_ms=1,
+            explicit=False,
+        )
+
+    track = make_track("link_track", ["link_artist", "link_artist2"])
+    track2 = make_track("link_track2", ["link_artist2"])
+    Track.create_many([track, track2])
+    artist = Artist(id="link_artist", name="name", uri="uri", genres=["genre", "genre2"])
+    artist2 = Artist(id="link_artist2", name="name", uri="uri", genres=["genre2"])
+    Artist.upsert_many([artist, artist2])
+
+    # Query through link tables
+    assert set(Track.read_by_artists(["link_artist2"])) == {track, track2}
+    assert set(Artist.read_by_tracks([track.id])) == {artist, artist2}
+    assert Artist.read_by_genres(["genre"]) == [artist]
+    assert Artist.read_genre_counts() == {"genre2": 2, "genre": 1}
+
+    # Writes replace links
+    track = Track.read_id(track.id)
+    track.artist_ids = ["link_artist"]
+    Track.update_many([track])
+    assert Track.read_by_artists(["link_artist2"]) == [track2]
+    artist.genres = []
+    Artist.upsert_many([artist])
+    assert Artist.read_genre_counts() == {"genre2": 1}
+
+    # Links can be rebuilt from JSON columns
+    frame = TrackArtist.read_frame()
+    Track.rebuild_links()
+    assert TrackArtist.read_frame().sort("track_id").equals(frame.sort("track_id"))
+
+    # Deletes remove links
+    for obj in [*Track.read_many([track.id, track2.id]), *Artist.read_many([artist.id, artist2.id])]:
+        obj.delete()
+    assert TrackArtist.read_frame().is_empty()
+    assert Artist.read_genre_counts() == {}
+
+
+def test_rows_from_spotify():
+    items = [make_track(make_id(i)) for i in range(3)]
+    original_items = copy.deepcopy(items)
+
+    # Rows match models, without mutating input
+    rows = Track.rows_from_spotify(items)
+    assert items == original_items
+    assert [{k: v for k, v in row.items() if k not in {"create_ts", "update_ts"}} for row in rows] == [
+        Track.from_spotify(item).model_dump(exclude={"pkey", "create_ts", "update_ts"}) for item in items
+    ]
+    assert items == original_items
+
+    # Batches are validated
+    with pytest.raises(ValidationError):
+        Track.rows_from_spotify([{**items[0], "duration_ms": "long"}])
+
+    # Rows are written directly
+    Track.create_rows(rows)
+    Track.upsert_rows(Track.rows_from_spotify(items))
+    assert set(Track.read_many([row["id"] for row in rows])) == {Track(**row) for row in rows}
+
+    # Clean up
+    for track in Track.read_many([row["id"] for row in rows]):
+        track.delete()
+
+
+def test_upsert_round_trip():
+    # Unvalidated table models keep ints where the column is a float
+    item = make_features(make_id(7))
+    Features.create_many([Features.from_spotify(item)])
+    state = SyncState(id="round_trip_user", added_at=datetime.now(tz=timezone.utc), track_id=make_id(0))
+    state.upsert()
+
+    # Rows read back, or rebuilt from the same payload, are unchanged
+    unchanged = {"inserted": 0, "updated": 0, "unchanged": 1}
+    assert Features.upsert_many(Features.read_many([item["id"]])) == unchanged
+    assert Features.upsert_many([Features.from_spotify(item)]) == unchanged
+    assert SyncState.upsert_many(SyncState.read_many([state.id])) == unchanged  # naive datetimes from SQLite
+
+    # Updates skip unchanged rows, which keep their timestamps and change sequence values
+    features = Features.read_many([item["id"]])
+    change_seq = models.read_change_seq()
+    Features.update_many(features)
+    assert Features.read_many([item["id"]])[0].update_ts == features[0].update_ts
+    assert models.read_change_seq() == change_seq
+
+    # Clean up
+    Features.delete_many([item["id"]])
+    SyncState.delete_many([state.id])
+
+
+def test_delete_many(monkeypatch: "pytest.MonkeyPatch"):
+    artists = [Artist(id=f"delete_artist{i}", name="name", uri="uri", genres=["genre"]) for i in range(25)]
+    Artist.create_many(artists)
+    ids = [a.id for a in artists]
+
+    stale = Artist.read_many(ids[:1])
+
+    # Chunked set-based deletes, links included
+    monkeypatch.setattr(models, "READ_CHUNK_SIZE", 10)
+    assert Artist.delete_many([*ids, "missing"]) == len(ids)
+    assert Artist.read_many(ids) == []
+
+    # Updates don't bring deleted rows back
+    with pytest.raises(StaleDataError):
+        Artist.update_many(stale)
+    assert Artist.read_many(ids) == []
+    assert Artist.read_genre_counts() == {}
+
+
+def _read_album_artist_links(ids: list[str]) -> list[str]:
+    # Album IDs of link rows, read directly, since reads through links skip those without an album
+    with session_scope() as session:
+        return list(session.exec(select(AlbumArtist.album_id).where(col(AlbumArtist.album_id).in_(ids))))
+
+
+def test_collect_garbage():
+    # Checks only the rows created here, since other tests may leave orphans behind
+    ids = [make_id(i) for i in range(3)]
+    tracks = Track.rows_from_spotify([make_track(id) for id in ids[:2]])
+    Track.create_rows(tracks)
+    Album.create_rows(Album.rows_from_spotify([make_album(id) for id in ids[:2]]))
+    Artist.create_rows(Artist.rows_from_spotify([make_artist(id) for id in ids[:2]]))
+    Features.create_rows(Features.rows_from_spotify([make_features(id) for id in ids]))
+
+    # Only rows no longer referenced by any track are deleted, along with their links
+    counts = collect_garbage()
+    assert all(counts[name] >= n for name, n in {"albums": 1, "features": 1}.items())
+    assert [a.id for a in Album.read_many(ids)] == ids[:1]
+    assert [a.id for a in Artist.read_many(ids)] == ids[:2]
+    assert [f.id for f in Features.read_many(ids)] == ids[:2]
+    assert _read_album_artist_links(ids) == ids[:1]
+
+    # Orphans cascade from albums to artists
+    Track.delete_many([t["id"] for t in tracks])
+    collect_garbage()
+    assert Album.read_many(ids) == Artist.read_many(ids) == Features.read_many(ids) == []
+    assert _read_album_artist_links(ids) == []
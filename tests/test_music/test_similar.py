@@ -0,0 +1,72 @@
+from typing import TYPE_CHECKING
+
+import pytest
+
+from music import similar
+from music.feature_store import FeatureStore
+from music.models import Features
+from music.similar import SimilarIndex
+from tests.fake_spotify import make_features, make_id
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+def _brute_force(index: SimilarIndex, id: str, k: int) -> list[float]:
+    # Distances rather than IDs, since fake features tie
+    values = index._standardize(index.store.array)
+    row = index.store.get_rows([id])[0]
+    dists, rows = similar._nearest(values[[row]], values, len(values))
+    return dists[0][rows[0] != row][:k].tolist()
+
+
+def test_similar(tmp_path: "Path", monkeypatch: "pytest.MonkeyPatch"):
+    monkeypatch.setattr(similar, "MAX_PENDING", 20)
+    items = [make_features(make_id(i)) for i in range(200)]
+    Features.create_rows(Features.rows_from_spotify(items[:150]))
+    store = FeatureStore(str(tmp_path))
+    store.update()
+
+    # Tree matches brute force, for every query of a batch
+    index = SimilarIndex(store)
+    ids = [make_id(i) for i in range(5)]
+    df = index.similar_tracks(ids, k=3)
+    assert df.columns == ["query_id", "id", "distance"]
+    for id in ids:
+        assert df.filter(query_id=id)["distance"].to_list() == pytest.approx(_brute_force(index, id, 3))
+
+    # Rows added since the build are searched too, until there are enough to rebuild
+    Features.create_rows(Features.rows_from_spotify(items[150:160]))
+    assert index.update() == len(store)
+    assert len(index._pending) == 10
+    assert index.similar_tracks([make_id(155)], k=5)["distance"].to_list() == pytest.approx(
+        _brute_force(index, make_id(155), 5)
+    )
+    Features.create_rows(Features.rows_from_spotify(items[160:]))
+    index.update()
+    assert len(index._pending) == 0
+
+    # Rows changed in place are searched at their new values, and skipped in the tree
+    Features.upsert_rows(Features.rows_from_spotify([{**items[3], "tempo": 500.0}]))
+    index.update()
+    assert index._pending_rows.tolist() == store.get_rows([make_id(3)]).tolist()
+    for id in [make_id(3), make_id(4)]:
+        assert index.similar_tracks([id], k=5)["distance"].to_list() == pytest.approx(_brute_force(index, id, 5))
+
+    # Playlists are matched by their centroid, and their own tracks are excluded
+    playlist = [make_id(i) for i in range(10)] + ["no_features"]
+    df2 = index.similar_to_playlist(playlist, k=4)
+    assert len(df2) == 4
+    assert df2["distance"].is_sorted()
+    assert not df2["id"].is_in(playlist).any()
+
+    # Index is persisted, and loaded at current values
+    index2 = SimilarIndex(FeatureStore(str(tmp_path)))
+    assert len(index2) == len(store)
+    assert len(index2._pending) == 0
+    assert index2.similar_tracks([make_id(3)], k=5)["distance"].to_list() == pytest.approx(
+        _brute_force(index, make_id(3), 5)
+    )
+
+    # Clean up
+    Features.delete_many(item["id"] for item in items)
@@ -0,0 +1,86 @@
+import functools
+from typing import TYPE_CHECKING, Any
+
+import pytest
+
+from music import api
+from music.models import Album, Artist, Features, Playlist, PlaylistTrack, RunState, SyncState, Track
+from music.workflows import checkpoint, get_playlists, pipeline
+from tests.fake_spotify import FakeSpotifyServer, make_id
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+
+def test_pipeline(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(api, "BACKOFF_MIN", 0.0)  # retry injected 429s right away
+    with FakeSpotifyServer(num_saved_tracks=120, rate_limit_every=7) as server:
+        client = server.get_client()
+        state = SyncState(id="user")
+
+        # Every stage saves what the tracks reference; artists come from both tracks and albums
+        counts = pipeline.run(client, client, state)
+        assert counts == {"tracks": 120, "albums": 60, "artists": 120, "features": 120}
+        assert state.track_id == make_id(0)
+        assert len(Album.read_many([make_id(i) for i in range(60)])) == 60
+
+        # Nothing new on the next run
+        counts = pipeline.run(client, client, state)
+        assert counts == {"tracks": 0, "albums": 0, "artists": 0, "features": 0}
+
+    # Clean up
+    ids = [make_id(i) for i in range(120)]
+    for model in [Track, Album, Artist, Features]:
+        model.delete_many(ids)
+
+
+def test_checkpoint():
+    ids = [make_id(i) for i in range(250)]
+    requested: list[str] = []
+    with FakeSpotifyServer() as server:
+        client = server.get_client()
+
+        def iter_features(ids: list[str], fail_after: int | None = None) -> "Iterator[list[dict[str, Any] | None]]":
+            requested.extend(ids)
+            for i, batch in enumerate(api.iter_features(client, ids)):
+                if i == fail_after:
+                    raise RuntimeError("Token expired.")
+                yield batch
+
+        # Batches saved before a failure are kept
+        with pytest.raises(RuntimeError):
+            checkpoint.run("test", Features, lambda: ids, functools.partial(iter_features, fail_after=2))
+        assert len(Features.read_many(ids)) == 200
+        assert RunState.read_id("test").num_done == 200
+
+        # Resuming fetches only the rest, even if `get_ids` would now return something else
+        requested.clear()
+        assert checkpoint.run("test", Features, list, iter_features) == 250
+        assert requested == ids[200:]
+        assert RunState.read_id("test").finished
+
+        # A finished run starts over
+        assert checkpoint.run("test", Features, list, iter_features) == 0
+
+    # Clean up
+    Features.delete_many(ids)
+    RunState.read_id("test").delete()
+
+
+def test_sync_playlists(monkeypatch: pytest.MonkeyPatch):
+    ids = [make_id(i) for i in range(3)]
+    with FakeSpotifyServer(num_playlists=3, num_playlist_tracks=5) as server:
+        monkeypatch.setattr(api, "get_user_client", server.get_client)
+        get_playlists.main()
+        assert len(Playlist.read_many(ids)) == 3
+        assert len(PlaylistTrack.read_frame().filter(playlist_id=ids[2])) == 5
+
+        # Unfollowed playlists are dropped, with their tracks
+        server.num_playlists = 2
+        get_playlists.main()
+        assert len(Playlist.read_many(ids)) == 2
+        assert PlaylistTrack.read_frame().filter(playlist_id=ids[2]).is_empty()
+
+    # Clean up
+    PlaylistTrack.delete_playlists(ids)
+    Playlist.delete_many(ids)